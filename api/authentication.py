@@ -0,0 +1,136 @@
+"""
+Cache em memória da autenticação.
+
+`TokenAuthentication` faz um join `authtoken_token` x `api_user` por
+requisição e a sessão carrega o usuário de novo a cada uma. Aqui os dois
+caminhos consultam antes um LRU do processo (MAX_ENTRIES itens, cada um
+válido por TIMEOUT segundos): token -> usuário e id -> usuário. O JWT já é
+validado só pela assinatura; o usuário do claim também sai do LRU, então
+uma requisição com JWT normalmente não consulta o banco.
+
+Salvar ou apagar o usuário (troca de senha, desativação, edição) e apagar um
+token removem as entradas na hora, e o logout remove as do usuário que saiu.
+Essas remoções valem para o processo atual; nos demais o TIMEOUT limita por
+quanto tempo um usuário desativado ainda passa.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import ValidationError
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+}
+
+
+def _setting(name):
+    return getattr(settings, 'AUTH_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class LRUCache:
+    """
+    Mapa limitado com expiração; o item menos usado sai quando enche. Cada
+    item guarda o id do usuário dono, para `delete_user`.
+    """
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, _, expires = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, user_id):
+        with self._lock:
+            self._items[key] = (value, user_id, time.monotonic() + _setting('TIMEOUT'))
+            self._items.move_to_end(key)
+            while len(self._items) > _setting('MAX_ENTRIES'):
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            stale = [key for key, (_, owner, _) in self._items.items() if owner == user_id]
+            for key in stale:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+users = LRUCache()
+
+
+def forget_user(user_id):
+    """Tira do cache tudo o que aponta para o usuário."""
+    users.delete_user(user_id)
+
+
+def forget_token(key):
+    users.delete(('token', key))
+
+
+def _copy(user):
+    # Cada requisição recebe a própria instância: nada do que a view altera vaza para o cache
+    return copy.copy(user)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        token = users.get(('token', key))
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            users.set(('token', key), token, user.pk)
+        return _copy(token.user), token
+
+
+class CachedModelBackend(ModelBackend):
+    """Carrega o usuário da sessão pelo cache (o hash da sessão continua sendo conferido)."""
+
+    def get_user(self, user_id):
+        cached = users.get(('user', user_id))
+        if cached is not None:
+            return _copy(cached)
+        user = super().get_user(user_id)
+        if user is not None:
+            users.set(('user', user_id), user, user.pk)
+            return _copy(user)
+        return None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """Usuário do access token pelo cache; na falta, a busca (e as checagens) do simplejwt."""
+
+    def get_user(self, validated_token):
+        # O claim pode vir como texto; a chave do cache usa o id como na sessão
+        try:
+            user_id = self.user_model._meta.pk.to_python(validated_token.get(jwt_settings.USER_ID_CLAIM))
+        except ValidationError:
+            user_id = None
+        cached = users.get(('user', user_id))
+        if cached is not None:
+            return _copy(cached)
+        user = super().get_user(validated_token)
+        users.set(('user', user.pk), user, user.pk)
+        return _copy(user)
@@ -0,0 +1,142 @@
+"""
+Escritas em lote de receitas e ingredientes.
+
+Os itens já chegam validados pelos serializers. Cada tabela recebe um
+`bulk_create`/`bulk_update` por lote dentro de uma única transação, então o
+número de consultas cresce com a quantidade de lotes e não com a de linhas.
+Como as operações em lote não disparam sinais, os índices de busca e de
+ingredientes são atualizados aqui.
+"""
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from api import feed, ingredient_index, search
+from api.steps import spaced_keys
+from api.conditional import touch_recipe
+from api.models import Ingredient, Media, PreparationStep, Recipe
+
+CHILDREN = ('ingredients', 'steps', 'media')
+
+# Ligado enquanto uma escrita em lote apaga linhas e reindexa no fim
+_reindexing = ContextVar('bulk_reindexing', default=False)
+
+
+def reindexing():
+    """Os sinais por linha devem deixar os índices para quem está apagando em lote."""
+    return _reindexing.get()
+
+
+def item_errors(errors):
+    """
+    Erros de um serializer `many=True` como `[{'index': i, 'errors': ...}]`,
+    só dos itens inválidos (o DRF entrega lista ou dict por índice).
+    """
+    pairs = sorted(errors.items()) if isinstance(errors, dict) else enumerate(errors)
+    return [{'index': index, 'errors': detail} for index, detail in pairs if detail]
+
+
+def create_recipes(author, items, batch_size=500):
+    """
+    Grava os itens validados e retorna os ids das receitas criadas, na ordem.
+    Um item pode trazer o próprio `author_id`; senão vale `author`.
+    """
+    recipe_ids = []
+    with transaction.atomic():
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            recipes = []
+            for item in batch:
+                fields = {key: value for key, value in item.items() if key not in CHILDREN}
+                if 'author_id' not in fields:
+                    fields['author'] = author
+                recipes.append(Recipe(**fields))
+            recipes = Recipe.objects.bulk_create(recipes)
+
+            ingredients, steps, media, terms = [], [], [], {}
+            for recipe, item in zip(recipes, batch):
+                media += [Media(recipe=recipe, **data) for data in item.get('media', [])]
+                ingredients += [Ingredient(recipe=recipe, **data) for data in item.get('ingredients', [])]
+                ordered = sorted(item.get('steps', []), key=lambda data: data['order'])
+                steps += [
+                    PreparationStep(recipe=recipe, order=key, description=data['description'])
+                    for data, key in zip(ordered, spaced_keys(len(ordered)))
+                ]
+                terms[recipe.pk] = {ingredient_index.normalize(data['name']) for data in item.get('ingredients', [])}
+
+            Ingredient.objects.bulk_create(ingredients, batch_size=batch_size)
+            PreparationStep.objects.bulk_create(steps, batch_size=batch_size)
+            Media.objects.bulk_create(media, batch_size=batch_size)
+
+            batch_ids = [recipe.pk for recipe in recipes]
+            search.index_recipes(batch_ids)
+            ingredient_index.add_recipes(terms)
+            feed.fan_out(recipes)
+            recipe_ids += batch_ids
+    return recipe_ids
+
+
+INGREDIENT_FIELDS = ('name', 'quantity', 'measure_unit')
+
+
+def ingredient_id_errors(items, existing):
+    """Erros por item dos `id` que não são de `existing` ou que se repetem, no formato de `item_errors`."""
+    seen, errors = set(), []
+    for index, item in enumerate(items):
+        if 'id' not in item:
+            continue
+        if item['id'] not in existing:
+            errors.append({'index': index, 'errors': {'id': ['Ingrediente não pertence a esta receita.']}})
+        elif item['id'] in seen:
+            errors.append({'index': index, 'errors': {'id': ['Ingrediente repetido.']}})
+        seen.add(item['id'])
+    return errors
+
+
+def apply_ingredient_diff(recipe, items, replace):
+    """
+    Aplica a lista validada de ingredientes da receita: itens com `id`
+    atualizam (só se algo mudou), sem `id` criam e, com `replace`, os que
+    ficaram de fora são apagados. Os ids são conferidos já com as linhas
+    travadas; se algum não serve, levanta ValueError com os erros por item e
+    nada é gravado.
+    """
+    with transaction.atomic():
+        existing = {ingredient.pk: ingredient for ingredient in recipe.ingredients.select_for_update()}
+        errors = ingredient_id_errors(items, existing)
+        if errors:
+            raise ValueError(errors)
+        touched = {ingredient_index.normalize(ingredient.name) for ingredient in existing.values()}
+
+        to_create, to_update, kept = [], [], set()
+        for item in items:
+            data = {field: item[field] for field in INGREDIENT_FIELDS if field in item}
+            if 'name' in data:
+                touched.add(ingredient_index.normalize(data['name']))
+            if 'id' not in item:
+                to_create.append(Ingredient(recipe=recipe, **data))
+                continue
+            ingredient = existing[item['id']]
+            kept.add(ingredient.pk)
+            if any(getattr(ingredient, field) != value for field, value in data.items()):
+                for field, value in data.items():
+                    setattr(ingredient, field, value)
+                to_update.append(ingredient)
+        to_delete = [pk for pk in existing if pk not in kept] if replace else []
+
+        Ingredient.objects.bulk_create(to_create)
+        Ingredient.objects.bulk_update(to_update, INGREDIENT_FIELDS)
+        if to_delete:
+            # Os sinais por linha veem `reindexing()` e não fazem nada; os
+            # índices e a versão da receita são atualizados uma vez, abaixo
+            token = _reindexing.set(True)
+            try:
+                Ingredient.objects.filter(pk__in=to_delete).delete()
+            finally:
+                _reindexing.reset(token)
+
+        if to_create or to_update or to_delete:
+            ingredient_index.sync_recipe(recipe.pk, touched)
+            search.index_recipes([recipe.pk])
+            touch_recipe(recipe.pk)
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(to_delete)}
@@ -0,0 +1,99 @@
+"""
+Cache das respostas serializadas de receita, com invalidação por geração.
+
+Cada receita tem uma geração (timestamp) guardada no cache; a chave da
+resposta inclui essa geração. Invalidar é só trocar a geração, então uma
+reconstrução que estava em andamento durante a escrita grava numa chave que
+ninguém mais lê e nunca devolve dado velho.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 10,
+    'LOCK_WAIT': 2.0,
+    'FACETS_TIMEOUT': 60,
+}
+
+
+def _setting(name):
+    return getattr(settings, 'RECIPE_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def _cache():
+    return caches[_setting('ALIAS')]
+
+
+def _generation_key(recipe_id):
+    return f'recipe:{recipe_id}:generation'
+
+
+def _generation(recipe_id):
+    cache = _cache()
+    key = _generation_key(recipe_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_or_build(recipe_id, name, build):
+    """
+    Devolve a resposta `name` da receita, reconstruindo com `build()` em caso
+    de falta. Só um processo reconstrói cada chave por vez (single-flight); os
+    demais esperam o valor aparecer por até LOCK_WAIT segundos.
+    """
+    cache = _cache()
+    key = f'recipe:{recipe_id}:{name}:{_generation(recipe_id)}'
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, _setting('LOCK_TIMEOUT')):
+        try:
+            value = build()
+            cache.set(key, value, _setting('TIMEOUT'))
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + _setting('LOCK_WAIT')
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    # Quem segurava a trava demorou demais: responde sem gravar
+    return build()
+
+
+def remember(key, build, timeout_setting='TIMEOUT'):
+    """
+    Cache simples por tempo, sem geração, para dados que não pertencem a uma
+    receita e podem ficar defasados até o timeout (ex.: contagens de facetas).
+    """
+    cache = _cache()
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, _setting(timeout_setting))
+    return value
+
+
+def invalidate_recipe(recipe_id):
+    """
+    Descarta todas as respostas em cache da receita. Roda de novo após o
+    commit para que uma leitura concorrente feita antes dele não fique valendo.
+    """
+    def bump():
+        _cache().set(_generation_key(recipe_id), time.time_ns(), None)
+
+    bump()
+    transaction.on_commit(bump)
@@ -0,0 +1,92 @@
+"""
+Exportação e importação do catálogo de receitas em NDJSON (uma receita por
+linha, com ingredientes, passos e mídias).
+
+As duas pontas trabalham em lotes: a exportação lê com `iterator(chunk_size)`
+e os prefetches são feitos por lote, e a importação acumula `batch_size`
+linhas antes de cada `bulk_create`. A memória usada não depende do tamanho
+do catálogo.
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from api import bulk
+from api.models import Recipe
+from api.serializers import RecipeCatalogSerializer
+
+User = get_user_model()
+
+
+class CatalogImportError(Exception):
+    """Linha inválida na importação; `line` é o número da linha (a partir de 1)."""
+
+    def __init__(self, line, errors):
+        super().__init__(f"Linha {line}: {errors}")
+        self.line = line
+        self.errors = errors
+
+
+def export_lines(queryset=None, chunk_size=500):
+    """Gera as linhas NDJSON (com `\\n`) das receitas do queryset, por id."""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    recipes = (
+        queryset.select_related('author')
+        .prefetch_related('ingredients', 'steps', 'media')
+        .order_by('id')
+        .iterator(chunk_size=chunk_size)
+    )
+    serializer = RecipeCatalogSerializer()
+    for recipe in recipes:
+        yield json.dumps(serializer.to_representation(recipe), ensure_ascii=False) + '\n'
+
+
+def import_lines(lines, default_author=None, batch_size=500):
+    """
+    Importa as linhas NDJSON em uma transação, gravando a cada `batch_size`
+    receitas. O autor vem do email da linha; sem email (ou email que não
+    existe aqui) usa `default_author`. Levanta CatalogImportError na primeira
+    linha inválida, sem gravar nada. Retorna a quantidade de receitas
+    importadas.
+    """
+    authors = {}
+    total = 0
+
+    def resolve_authors(batch):
+        emails = {item['author']['email'] for _, item in batch if 'author' in item} - set(authors)
+        if emails:
+            authors.update(User.objects.filter(email__in=emails).values_list('email', 'pk'))
+            authors.update({email: None for email in emails if email not in authors})
+
+        items = []
+        for number, item in batch:
+            email = item.pop('author', {}).get('email')
+            author_id = authors.get(email)
+            if author_id is None and default_author is None:
+                raise CatalogImportError(number, {'author': [f'Usuário {email} não encontrado.']})
+            item['author_id'] = author_id if author_id is not None else default_author.pk
+            items.append(item)
+        return items
+
+    with transaction.atomic():
+        batch = []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                raise CatalogImportError(number, str(e))
+            serializer = RecipeCatalogSerializer(data=data)
+            if not serializer.is_valid():
+                raise CatalogImportError(number, serializer.errors)
+            batch.append((number, serializer.validated_data))
+
+            if len(batch) >= batch_size:
+                total += len(bulk.create_recipes(None, resolve_authors(batch), batch_size=batch_size))
+                batch = []
+        if batch:
+            total += len(bulk.create_recipes(None, resolve_authors(batch), batch_size=batch_size))
+    return total
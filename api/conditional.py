@@ -0,0 +1,64 @@
+"""
+GET condicional (ETag / Last-Modified) para as respostas de uma receita.
+
+A versão é o `Recipe.updated_at`, que também avança quando ingredientes,
+passos, comentários ou avaliações mudam (`touch_recipe`). A checagem lê só
+essa coluna (ou o cache), sem carregar nem serializar as linhas filhas.
+"""
+from functools import wraps
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from api import cache as recipe_cache
+from api.models import Recipe
+
+
+def touch_recipe(recipe_id):
+    """Avança a versão da receita e descarta as respostas em cache."""
+    Recipe.objects.filter(pk=recipe_id).update(updated_at=timezone.now())
+    recipe_cache.invalidate_recipe(recipe_id)
+
+
+def recipe_version(recipe_id):
+    """`updated_at` da receita, ou None se ela não existe."""
+    return recipe_cache.get_or_build(
+        recipe_id, 'version',
+        lambda: Recipe.objects.filter(pk=recipe_id).values_list('updated_at', flat=True).first()
+    )
+
+
+def recipe_etag(recipe_id, updated_at):
+    return f'"{recipe_id}-{int(updated_at.timestamp() * 1_000_000)}"'
+
+
+def recipe_conditional(lookup='id'):
+    """
+    Responde 304 quando `If-None-Match`/`If-Modified-Since` ainda valem para
+    a receita do kwarg `lookup`; senão chama a view e anexa os cabeçalhos.
+    Fica abaixo de `@api_view` para rodar depois da autenticação.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                recipe_id = int(kwargs[lookup])
+            except (KeyError, TypeError, ValueError):
+                return view(request, *args, **kwargs)
+
+            updated_at = recipe_version(recipe_id)
+            if updated_at is None:
+                return view(request, *args, **kwargs)
+
+            etag = recipe_etag(recipe_id, updated_at)
+            last_modified = int(updated_at.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
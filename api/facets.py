@@ -0,0 +1,118 @@
+"""
+Contagens de facetas da busca de receitas (dificuldade, UF e faixa de tempo
+de preparo) calculadas com uma única consulta de agregação condicional.
+
+Cada faceta é contada com todos os filtros ativos menos o dela mesma, como
+nas buscas facetadas: com `difficulty=FACIL` as contagens de MEDIO e DIFICIL
+continuam dizendo quantas receitas a troca de dificuldade traria.
+"""
+import hashlib
+import json
+
+from django.db.models import Count, Q
+
+from api import cache as recipe_cache
+from api.models import Recipe, State
+
+FACETS = ('difficulty', 'state', 'prep_time')
+
+# (rótulo, mínimo, máximo) em minutos; None = sem limite
+PREP_TIME_BUCKETS = (
+    ('0-15', None, 15),
+    ('16-30', 16, 30),
+    ('31-60', 31, 60),
+    ('61+', 61, None),
+)
+
+
+def parse(value):
+    """
+    Interpreta o parâmetro `facets`: `true`/`1`/`all` pede todas, senão uma
+    lista separada por vírgula. Levanta ValueError com a faceta desconhecida.
+    """
+    if value.strip().lower() in ('1', 'true', 'all'):
+        return FACETS
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    for name in names:
+        if name not in FACETS:
+            raise ValueError(name)
+    return tuple(name for name in FACETS if name in names)
+
+
+def filters(params):
+    """
+    `{faceta: Q}` dos filtros estruturados presentes em `params`. Levanta
+    ValueError com a mensagem para o cliente se `prep_time` não for inteiro.
+    """
+    active = {}
+    if params.get('difficulty'):
+        active['difficulty'] = Q(difficulty=params['difficulty'])
+    if params.get('prep_time'):
+        try:
+            prep_time = int(params['prep_time'])
+        except ValueError:
+            raise ValueError('O parâmetro "prep_time" deve ser um número inteiro')
+        active['prep_time'] = Q(prep_time__lte=prep_time)
+    if params.get('state'):
+        # UFs são gravadas em maiúsculas; comparação exata usa índice, iexact não
+        active['state'] = Q(state=params['state'].upper())
+    return active
+
+
+def _conditions(names):
+    conditions = {}
+    if 'difficulty' in names:
+        for value in Recipe.Difficulty.values:
+            conditions[('difficulty', value)] = Q(difficulty=value)
+    if 'state' in names:
+        for value in State.values:
+            conditions[('state', value)] = Q(state=value)
+    if 'prep_time' in names:
+        for label, low, high in PREP_TIME_BUCKETS:
+            condition = Q()
+            if low is not None:
+                condition &= Q(prep_time__gte=low)
+            if high is not None:
+                condition &= Q(prep_time__lte=high)
+            conditions[('prep_time', label)] = condition
+    return conditions
+
+
+def count(queryset, names=FACETS, params=None):
+    """
+    `{faceta: {valor: total}}` em uma consulta. `queryset` vem sem os filtros
+    estruturados (só a busca textual); os de `params` entram por faceta.
+    """
+    active = filters(params or {})
+    conditions = _conditions(names)
+    aliases = {f'facet_{index}': key for index, key in enumerate(conditions)}
+
+    def condition(name, value):
+        result = conditions[(name, value)]
+        for other, other_condition in active.items():
+            if other != name:
+                result &= other_condition
+        return result
+
+    totals = queryset.order_by().aggregate(
+        **{alias: Count('pk', filter=condition(*key)) for alias, key in aliases.items()}
+    )
+
+    result = {name: {} for name in names}
+    for alias, (name, value) in aliases.items():
+        result[name][value] = totals[alias]
+    return result
+
+
+def cached_count(queryset, names, params):
+    """
+    Igual a `count`, mas guarda em cache as combinações só de filtros
+    estruturados (dificuldade, UF, tempo), que são poucas e se repetem.
+    Buscas textuais são calculadas sempre.
+    """
+    if params.get('q') or params.get('title'):
+        return count(queryset, names, params)
+
+    filters = [params.get('difficulty') or '', params.get('prep_time') or '', (params.get('state') or '').upper()]
+    digest = hashlib.md5(json.dumps([filters, names]).encode('utf-8')).hexdigest()
+    return recipe_cache.remember(f'recipe-facets:{digest}', lambda: count(queryset, names, params), 'FACETS_TIMEOUT')
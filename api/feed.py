@@ -0,0 +1,132 @@
+"""
+Feed de receitas de quem o usuário segue.
+
+Fan-out na escrita: ao publicar, a receita é copiada (TimelineEntry) para a
+timeline de cada seguidor, e o feed vira uma varredura do índice
+`(user, created_at, recipe)`. Autores com mais de FANOUT_LIMIT seguidores
+ficam com `fanout_on_read`: as receitas deles não são copiadas e o feed as
+busca na hora pelo índice `(author, created_at)`, intercalando com a
+timeline gravada (FeedPagination).
+
+Cada timeline guarda no máximo TIMELINE_LENGTH entradas. O excesso é
+apagado pelo comando `trim_timelines` (rodar periodicamente), fora das
+requisições: abrir o feed é só leitura.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, F, Q
+
+from api.models import Recipe, TimelineEntry, User
+
+DEFAULTS = {
+    'FANOUT_LIMIT': 5000,
+    'TIMELINE_LENGTH': 800,
+    'FOLLOW_BACKFILL': 20,
+    'BATCH_SIZE': 1000,
+}
+
+Follow = User.following.through
+
+
+def _setting(name):
+    return getattr(settings, 'FEED', {}).get(name, DEFAULTS[name])
+
+
+def _write(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=_setting('BATCH_SIZE'), ignore_conflicts=True)
+
+
+def fan_out(recipes):
+    """Copia as receitas novas para as timelines dos seguidores de cada autor."""
+    by_author = defaultdict(list)
+    for recipe in recipes:
+        by_author[recipe.author_id].append(recipe)
+
+    limit = _setting('FANOUT_LIMIT')
+    batch_size = _setting('BATCH_SIZE')
+    follower_counts = dict(User.objects.filter(pk__in=by_author).values_list('pk', 'followers_count'))
+    for author_id, items in by_author.items():
+        on_read = follower_counts.get(author_id, 0) > limit
+        User.objects.filter(pk=author_id).exclude(fanout_on_read=on_read).update(fanout_on_read=on_read)
+        if on_read or not follower_counts.get(author_id):
+            continue
+
+        followers = Follow.objects.filter(to_user_id=author_id)
+        batch = []
+        for follower_id in followers.values_list('from_user_id', flat=True).iterator(chunk_size=batch_size):
+            batch += [
+                TimelineEntry(user_id=follower_id, recipe_id=recipe.pk, author_id=author_id, created_at=recipe.created_at)
+                for recipe in items
+            ]
+            if len(batch) >= batch_size:
+                _write(batch)
+                batch = []
+        _write(batch)
+
+
+def backfill(pairs):
+    """Traz as últimas receitas de cada autor recém-seguido; `pairs` é (seguidor, autor)."""
+    followers = defaultdict(list)
+    for follower_id, author_id in pairs:
+        followers[author_id].append(follower_id)
+
+    authors = User.objects.filter(pk__in=followers, fanout_on_read=False).values_list('pk', flat=True)
+    entries = []
+    for author_id in authors:
+        recent = Recipe.objects.filter(author_id=author_id).order_by('-created_at')
+        for recipe_id, created_at in recent.values_list('pk', 'created_at')[:_setting('FOLLOW_BACKFILL')]:
+            entries += [
+                TimelineEntry(user_id=follower_id, recipe_id=recipe_id, author_id=author_id, created_at=created_at)
+                for follower_id in followers[author_id]
+            ]
+    _write(entries)
+
+
+def forget(pairs):
+    """Tira da timeline do seguidor as receitas de quem ele deixou de seguir."""
+    condition = Q()
+    for follower_id, author_id in pairs:
+        condition |= Q(user_id=follower_id, author_id=author_id)
+    if condition:
+        TimelineEntry.objects.filter(condition).delete()
+
+
+def trim(user_id):
+    """Apaga as entradas além de TIMELINE_LENGTH na timeline do usuário."""
+    length = _setting('TIMELINE_LENGTH')
+    edge = (
+        TimelineEntry.objects.filter(user_id=user_id)
+        .order_by('-created_at', '-recipe_id')
+        .values_list('created_at', 'recipe_id')[length:length + 1]
+        .first()
+    )
+    if edge is None:
+        return 0
+    created_at, recipe_id = edge
+    older = Q(created_at__lt=created_at) | Q(created_at=created_at, recipe_id__lte=recipe_id)
+    return TimelineEntry.objects.filter(older, user_id=user_id).delete()[0]
+
+
+def trim_all():
+    """Aplica `trim` em todas as timelines acima do limite; retorna quantas entradas saíram."""
+    crowded = (
+        TimelineEntry.objects.values('user_id')
+        .annotate(total=Count('pk'))
+        .filter(total__gt=_setting('TIMELINE_LENGTH'))
+        .values_list('user_id', flat=True)
+    )
+    return sum(trim(user_id) for user_id in list(crowded))
+
+
+def sources(user):
+    """
+    Querysets do feed para FeedPagination: a timeline gravada, sem os autores
+    lidos na hora, e as receitas desses autores.
+    """
+    on_read = list(user.following.filter(fanout_on_read=True).values_list('pk', flat=True))
+    stored = TimelineEntry.objects.filter(user=user).only('created_at', 'recipe_id')
+    if not on_read:
+        return [stored]
+    pulled = Recipe.objects.filter(author_id__in=on_read).annotate(recipe_id=F('id')).only('created_at')
+    return [stored.exclude(author_id__in=on_read), pulled]
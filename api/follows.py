@@ -0,0 +1,42 @@
+"""
+Contadores de seguidores/seguindo do usuário.
+
+`followers_count` e `following_count` são ajustados com F() a partir das
+mudanças em `User.following` (sinal m2m_changed), então valem para a view e
+para qualquer `add`/`remove`. Só entram pares que de fato mudaram: na
+inclusão o Django já manda apenas os novos; na remoção os pares existentes
+são lidos antes (`existing_pairs`).
+"""
+from collections import Counter
+
+from django.db.models import F
+
+from api.models import User
+
+Follow = User.following.through
+
+
+def existing_pairs(follower_id=None, author_id=None, others=None):
+    """Pares `(seguidor, autor)` gravados, a partir de um dos lados."""
+    if follower_id is not None:
+        pairs = Follow.objects.filter(from_user_id=follower_id)
+        if others is not None:
+            pairs = pairs.filter(to_user_id__in=others)
+    else:
+        pairs = Follow.objects.filter(to_user_id=author_id)
+        if others is not None:
+            pairs = pairs.filter(from_user_id__in=others)
+    return list(pairs.values_list('from_user_id', 'to_user_id'))
+
+
+def apply(pairs, delta):
+    """Soma `delta` (1 ou -1) nos contadores de cada par `(seguidor, autor)`."""
+    for field, counts in (
+        ('following_count', Counter(follower_id for follower_id, _ in pairs)),
+        ('followers_count', Counter(author_id for _, author_id in pairs)),
+    ):
+        by_amount = {}
+        for user_id, count in counts.items():
+            by_amount.setdefault(count * delta, []).append(user_id)
+        for amount, user_ids in by_amount.items():
+            User.objects.filter(pk__in=user_ids).update(**{field: F(field) + amount})
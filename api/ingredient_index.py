@@ -0,0 +1,292 @@
+"""
+Índice invertido de ingredientes para a busca "cozinhar com o que tenho".
+
+Cada termo (nome de ingrediente normalizado) aponta para as receitas que o
+usam. Na consulta as listas viram bitsets (inteiros do Python) e a contagem
+de termos por receita é feita com contadores fatiados em bits, então o custo
+depende da quantidade de termos pedidos e não do número de linhas de
+`Ingredient`.
+"""
+import unicodedata
+from array import array
+
+from django.db import transaction
+from django.db.models import Q
+
+from api.models import Ingredient, IngredientPosting
+
+Kind = IngredientPosting.Kind
+
+
+def normalize(name):
+    """Minúsculas, sem acentos nem pontuação e com espaços colapsados."""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    text = ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+    return ' '.join(''.join(ch if ch.isalnum() else ' ' for ch in text).split())
+
+
+# ------------------ CODIFICAÇÃO ------------------
+def encode(bitset):
+    """
+    Escolhe a representação mais compacta para o conjunto de ids.
+    Retorna `(dense, bytes)`.
+    """
+    if not bitset:
+        return False, b''
+
+    dense_size = (bitset.bit_length() + 7) // 8
+    if dense_size <= 4 * bitset.bit_count():
+        return True, bitset.to_bytes(dense_size, 'little')
+    return False, array('I', iter_ids(bitset)).tobytes()
+
+
+def decode(dense, data):
+    """Converte as postagens gravadas em bitset."""
+    data = bytes(data)
+    if dense:
+        return int.from_bytes(data, 'little')
+
+    ids = array('I')
+    ids.frombytes(data)
+    if not ids:
+        return 0
+    bits = bytearray(ids[-1] // 8 + 1)
+    for recipe_id in ids:
+        bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def iter_ids(bitset):
+    """Ids presentes no bitset, em ordem crescente."""
+    for index, byte in enumerate(bitset.to_bytes((bitset.bit_length() + 7) // 8, 'little')):
+        while byte:
+            low = byte & -byte
+            yield index * 8 + low.bit_length() - 1
+            byte ^= low
+
+
+def _bitset(ids):
+    bits = bytearray(max(ids) // 8 + 1 if ids else 0)
+    for recipe_id in ids:
+        bits[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def _store(posting, bitset):
+    posting.dense, posting.postings = encode(bitset)
+    posting.recipe_count = bitset.bit_count()
+
+
+# ------------------ CONSULTA ------------------
+def _add_to_counter(planes, bitset):
+    """Soma 1 nas receitas do bitset (somador em cascata sobre os planos de bits)."""
+    carry = bitset
+    for index, plane in enumerate(planes):
+        planes[index] = plane ^ carry
+        carry &= plane
+        if not carry:
+            return
+    planes.append(carry)
+
+
+def _equal_to(planes, value, universe):
+    """Receitas cujo contador é exatamente `value`."""
+    if value >> len(planes):
+        return 0
+    result = universe
+    for index, plane in enumerate(planes):
+        result &= plane if value >> index & 1 else ~plane
+    return result
+
+
+def search(names, limit=20):
+    """
+    Receitas ordenadas pela cobertura: fração dos ingredientes distintos da
+    receita presentes em `names`. Empates ficam com quem casou mais
+    ingredientes e, depois, com as receitas mais novas.
+
+    Retorna uma lista de `(recipe_id, matched, total)`.
+    """
+    terms = {normalize(name) for name in names} - {''}
+    if not terms or limit <= 0:
+        return []
+
+    planes, candidates = [], 0
+    for posting in IngredientPosting.objects.filter(kind=Kind.TERM, key__in=terms):
+        bitset = decode(posting.dense, posting.postings)
+        _add_to_counter(planes, bitset)
+        candidates |= bitset
+    if not candidates:
+        return []
+
+    sizes = {}
+    for posting in IngredientPosting.objects.filter(kind=Kind.SIZE):
+        bitset = decode(posting.dense, posting.postings) & candidates
+        if bitset:
+            sizes[int(posting.key)] = bitset
+
+    matched_sets = {m: _equal_to(planes, m, candidates) for m in range(1, len(terms) + 1)}
+    buckets = sorted(
+        ((matched, total) for matched in matched_sets for total in sizes if total >= matched),
+        key=lambda pair: (-pair[0] / pair[1], -pair[0])
+    )
+
+    results = []
+    for matched, total in buckets:
+        bucket = matched_sets[matched] & sizes[total]
+        while bucket and len(results) < limit:
+            recipe_id = bucket.bit_length() - 1
+            bucket ^= 1 << recipe_id
+            results.append((recipe_id, matched, total))
+        if len(results) >= limit:
+            break
+    return results
+
+
+# ------------------ MANUTENÇÃO ------------------
+def recipe_terms(recipe_id):
+    names = Ingredient.objects.filter(recipe_id=recipe_id).values_list('name', flat=True)
+    return {normalize(name) for name in names} - {''}
+
+
+def sync_recipe(recipe_id, touched_terms, current_terms=None):
+    """
+    Ajusta a presença da receita nos termos que podem ter mudado e na
+    classe de tamanho correta. `current_terms` evita reconsultar os
+    ingredientes quando o chamador já os conhece.
+
+    Só as postagens envolvidas são travadas: as dos termos tocados e as das
+    classes de tamanho antiga e nova. A antiga sai dos termos tocados em que
+    a receita estava mais os que não mudaram.
+    """
+    if current_terms is None:
+        current_terms = recipe_terms(recipe_id)
+    touched_terms = {term for term in touched_terms if term}
+    bit = 1 << recipe_id
+    size_key = str(len(current_terms)) if current_terms else None
+
+    with transaction.atomic():
+        existing, bitsets = {}, {}
+        terms = IngredientPosting.objects.select_for_update().filter(kind=Kind.TERM, key__in=touched_terms)
+        for posting in terms:
+            existing[(posting.kind, posting.key)] = posting
+            bitsets[(posting.kind, posting.key)] = decode(posting.dense, posting.postings)
+
+        previous_terms = (current_terms - touched_terms) | {
+            key for (_, key), bitset in bitsets.items() if bitset & bit
+        }
+        size_keys = {key for key in (str(len(previous_terms)) if previous_terms else None, size_key) if key}
+        sizes = IngredientPosting.objects.select_for_update().filter(kind=Kind.SIZE, key__in=size_keys)
+        for posting in sizes:
+            existing[(posting.kind, posting.key)] = posting
+            bitsets[(posting.kind, posting.key)] = decode(posting.dense, posting.postings)
+
+        # A receita fica em exatamente uma classe de tamanho
+        wanted = {(Kind.SIZE, key): key == size_key for key in size_keys}
+        wanted.update({(Kind.TERM, term): term in current_terms for term in touched_terms})
+
+        to_create, to_update, to_delete = [], [], []
+        for (kind, key), member in wanted.items():
+            posting = existing.get((kind, key))
+            bitset = bitsets.get((kind, key), 0)
+            if bool(bitset & bit) == member:
+                continue
+            bitset = bitset | bit if member else bitset & ~bit
+            if posting is None:
+                posting = IngredientPosting(kind=kind, key=key)
+                _store(posting, bitset)
+                to_create.append(posting)
+            elif bitset:
+                _store(posting, bitset)
+                to_update.append(posting)
+            else:
+                to_delete.append(posting.pk)
+
+        IngredientPosting.objects.bulk_create(to_create)
+        IngredientPosting.objects.bulk_update(to_update, ['recipe_count', 'dense', 'postings'])
+        IngredientPosting.objects.filter(pk__in=to_delete).delete()
+
+
+def add_recipes(recipe_terms_map):
+    """
+    Indexa receitas novas em lote: `{recipe_id: {termos}}`. Cada postagem
+    afetada é lida e regravada uma única vez.
+    """
+    additions = {}
+    for recipe_id, terms in recipe_terms_map.items():
+        terms = {term for term in terms if term}
+        if not terms:
+            continue
+        for term in terms:
+            additions.setdefault((Kind.TERM, term), []).append(recipe_id)
+        additions.setdefault((Kind.SIZE, str(len(terms))), []).append(recipe_id)
+    if not additions:
+        return
+
+    with transaction.atomic():
+        lookup = Q()
+        for kind in Kind.values:
+            lookup |= Q(kind=kind, key__in=[key for k, key in additions if k == kind])
+        existing = {
+            (p.kind, p.key): p
+            for p in IngredientPosting.objects.select_for_update().filter(lookup)
+        }
+        to_create, to_update = [], []
+        for (kind, key), ids in additions.items():
+            posting = existing.get((kind, key))
+            bitset = _bitset(ids)
+            if posting is None:
+                posting = IngredientPosting(kind=kind, key=key)
+                to_create.append(posting)
+            else:
+                bitset |= decode(posting.dense, posting.postings)
+                to_update.append(posting)
+            _store(posting, bitset)
+
+        IngredientPosting.objects.bulk_create(to_create)
+        IngredientPosting.objects.bulk_update(to_update, ['recipe_count', 'dense', 'postings'])
+
+
+def build_postings(rows):
+    """
+    `(tipo, chave, bitset)` de todas as postagens a partir de
+    `(recipe_id, nome)` ordenados por receita (lidos em streaming).
+    """
+    term_ids, size_ids = {}, {}
+
+    def flush(recipe_id, terms):
+        terms.discard('')
+        for term in terms:
+            term_ids.setdefault(term, array('I')).append(recipe_id)
+        if terms:
+            size_ids.setdefault(str(len(terms)), array('I')).append(recipe_id)
+
+    current_recipe, current_terms = None, set()
+    for recipe_id, name in rows:
+        if recipe_id != current_recipe:
+            flush(current_recipe, current_terms)
+            current_recipe, current_terms = recipe_id, set()
+        current_terms.add(normalize(name))
+    flush(current_recipe, current_terms)
+
+    for kind, groups in ((Kind.TERM, term_ids), (Kind.SIZE, size_ids)):
+        for key, ids in groups.items():
+            yield kind, key, _bitset(ids)
+
+
+def rebuild(chunk_size=5000):
+    """
+    Reconstrói o índice inteiro lendo os ingredientes em streaming, ordenados
+    por receita. Retorna a quantidade de termos distintos.
+    """
+    rows = Ingredient.objects.order_by('recipe_id').values_list('recipe_id', 'name')
+    postings = []
+    for kind, key, bitset in build_postings(rows.iterator(chunk_size=chunk_size)):
+        posting = IngredientPosting(kind=kind, key=key)
+        _store(posting, bitset)
+        postings.append(posting)
+
+    with transaction.atomic():
+        IngredientPosting.objects.all().delete()
+        IngredientPosting.objects.bulk_create(postings, batch_size=500)
+    return sum(1 for posting in postings if posting.kind == Kind.TERM)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    help = "Recalcula as receitas parecidas (similaridade item a item de avaliações e favoritos)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-n', type=int, default=20, help="Receitas parecidas guardadas por receita")
+        parser.add_argument('--min-support', type=int, default=2, help="Mínimo de usuários em comum entre duas receitas")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Receitas comparadas por bloco")
+
+    def handle(self, *args, **options):
+        if not recommendations.is_available():
+            raise CommandError("As recomendações precisam do NumPy e do SciPy instalados.")
+        total = recommendations.build(
+            top_n=options['top_n'],
+            min_support=options['min_support'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"{total} similaridades gravadas com sucesso!"))
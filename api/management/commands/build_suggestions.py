@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import suggestions
+
+
+class Command(BaseCommand):
+    help = "Lê o grafo de seguidores e grava as sugestões de quem seguir de cada usuário"
+
+    def handle(self, *args, **options):
+        if not suggestions.is_available():
+            raise CommandError("As sugestões precisam do NumPy instalado.")
+        total = suggestions.build()
+        self.stdout.write(self.style.SUCCESS(f"Sugestões gravadas para {total} usuários com sucesso!"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api import catalog
+
+
+class Command(BaseCommand):
+    help = "Exporta o catálogo de receitas em NDJSON (uma receita por linha)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", default="-", help="Arquivo de saída ('-' para a saída padrão)")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Receitas lidas por lote")
+
+    def handle(self, *args, **options):
+        lines = catalog.export_lines(chunk_size=options["chunk_size"])
+        if options["output"] == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        total = 0
+        with open(options["output"], "w", encoding="utf-8") as output:
+            for line in lines:
+                output.write(line)
+                total += 1
+        self.stderr.write(self.style.SUCCESS(f"{total} receitas exportadas com sucesso!"))
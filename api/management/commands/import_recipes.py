@@ -0,0 +1,32 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api import catalog
+
+
+class Command(BaseCommand):
+    help = "Importa receitas de um arquivo NDJSON gerado pelo export_recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Arquivo NDJSON ('-' para a entrada padrão)")
+        parser.add_argument("--batch-size", type=int, default=500, help="Receitas gravadas por lote")
+        parser.add_argument("--author", help="Email do autor usado quando o da linha não existir aqui")
+
+    def handle(self, *args, **options):
+        default_author = None
+        if options["author"]:
+            default_author = get_user_model().objects.filter(email=options["author"]).first()
+            if default_author is None:
+                raise CommandError(f"Usuário {options['author']} não encontrado")
+
+        source = sys.stdin if options["path"] == "-" else open(options["path"], encoding="utf-8")
+        try:
+            total = catalog.import_lines(source, default_author=default_author, batch_size=options["batch_size"])
+        except catalog.CatalogImportError as e:
+            raise CommandError(str(e))
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        self.stdout.write(self.style.SUCCESS(f"{total} receitas importadas com sucesso!"))
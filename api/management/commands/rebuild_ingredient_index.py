@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import ingredient_index
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice invertido de ingredientes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Ingredientes lidos por lote")
+
+    def handle(self, *args, **options):
+        total = ingredient_index.rebuild(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{total} ingredientes indexados com sucesso!"))
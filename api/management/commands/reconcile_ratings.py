@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import ratings
+
+
+class Command(BaseCommand):
+    help = "Recalcula os agregados de avaliação (total, soma e histograma) das receitas"
+
+    def handle(self, *args, **options):
+        total = ratings.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"{total} receitas recalculadas com sucesso!"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import feed
+
+
+class Command(BaseCommand):
+    help = "Apaga as entradas das timelines do feed que passaram do limite (FEED['TIMELINE_LENGTH'])"
+
+    def handle(self, *args, **options):
+        total = feed.trim_all()
+        self.stdout.write(self.style.SUCCESS(f"{total} entradas removidas com sucesso!"))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:29
+
+import api.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE api_recipe_fts USING fts5("
+        "title, ingredients, steps, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    schema_editor.execute(
+        "INSERT INTO api_recipe_fts (rowid, title, ingredients, steps) "
+        "SELECT r.id, r.title, "
+        "COALESCE((SELECT group_concat(i.name, ' ') FROM api_ingredient i WHERE i.recipe_id = r.id), ''), "
+        "COALESCE((SELECT group_concat(s.description, ' ') FROM api_preparationstep s WHERE s.recipe_id = r.id), '') "
+        "FROM api_recipe r"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS api_recipe_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_user_following_alter_recipe_state_alter_user_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearchIndex',
+            fields=[
+                ('recipe', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='api.recipe')),
+                ('title', models.TextField(verbose_name='título')),
+                ('ingredients', models.TextField(verbose_name='ingredientes')),
+                ('steps', models.TextField(verbose_name='passos')),
+                ('document', api.models.SearchDocumentField(db_column='api_recipe_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'api_recipe_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
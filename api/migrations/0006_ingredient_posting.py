@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:31
+
+from django.db import migrations, models
+
+
+def build_ingredient_index(apps, schema_editor):
+    from api import ingredient_index
+
+    Ingredient = apps.get_model('api', 'Ingredient')
+    IngredientPosting = apps.get_model('api', 'IngredientPosting')
+    rows = Ingredient.objects.order_by('recipe_id').values_list('recipe_id', 'name').iterator(chunk_size=5000)
+    postings = []
+    for kind, key, bitset in ingredient_index.build_postings(rows):
+        posting = IngredientPosting(kind=kind, key=key)
+        ingredient_index._store(posting, bitset)
+        postings.append(posting)
+    IngredientPosting.objects.bulk_create(postings, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('TERMO', 'Termo'), ('TAMANHO', 'Tamanho')], max_length=7, verbose_name='tipo')),
+                ('key', models.CharField(max_length=255, verbose_name='chave')),
+                ('recipe_count', models.PositiveIntegerField(default=0, verbose_name='quantidade de receitas')),
+                ('dense', models.BooleanField(default=False, verbose_name='bitset')),
+                ('postings', models.BinaryField(default=bytes, verbose_name='postagens')),
+            ],
+            options={
+                'verbose_name': 'postagem de ingrediente',
+                'verbose_name_plural': 'postagens de ingredientes',
+                'unique_together': {('kind', 'key')},
+            },
+        ),
+        migrations.RunPython(build_ingredient_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:37
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    Rating = apps.get_model('api', 'Rating')
+    ratings = Rating.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe')
+
+    def aggregate(expression):
+        subquery = Subquery(ratings.annotate(value=expression).values('value'), output_field=IntegerField())
+        return Coalesce(subquery, Value(0))
+
+    values = {
+        'rating_count': aggregate(Count('id')),
+        'rating_sum': aggregate(Sum('rating')),
+    }
+    for star in range(1, 6):
+        values[f'rating_{star}'] = aggregate(Count('id', filter=Q(rating=star)))
+    Recipe.objects.update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, verbose_name='avaliações com 1 estrela'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, verbose_name='avaliações com 2 estrelas'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, verbose_name='avaliações com 3 estrelas'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, verbose_name='avaliações com 4 estrelas'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, verbose_name='avaliações com 5 estrelas'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='total de avaliações'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='soma das avaliações'),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:50
+
+from django.db import migrations, models
+
+GAP = 1024
+
+
+def spread_step_orders(apps, schema_editor):
+    # Renumera cada receita como GAP, 2*GAP, ... mantendo a ordem atual
+    # (empates pelo id), o que também elimina ordens repetidas
+    PreparationStep = apps.get_model('api', 'PreparationStep')
+    steps = PreparationStep.objects.order_by('recipe_id', 'order', 'id').only('id', 'recipe_id', 'order')
+
+    batch, current_recipe, position = [], None, 0
+    for step in steps.iterator(chunk_size=2000):
+        if step.recipe_id != current_recipe:
+            current_recipe, position = step.recipe_id, 0
+        position += 1
+        step.order = position * GAP
+        batch.append(step)
+        if len(batch) >= 2000:
+            PreparationStep.objects.bulk_update(batch, ['order'])
+            batch = []
+    PreparationStep.objects.bulk_update(batch, ['order'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_recipe_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_step_orders, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='preparationstep',
+            constraint=models.UniqueConstraint(fields=('recipe', 'order'), name='step_recipe_order_unique'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Cast, LPad
+
+ROOT_MAX = 10 ** 10 - 1
+
+
+def fill_root_paths(apps, schema_editor):
+    # Todos os comentários existentes são raízes: caminho = (MAX - id) com 10 dígitos
+    Comment = apps.get_model('api', 'Comment')
+    Comment.objects.update(
+        path=LPad(Cast(Value(ROOT_MAX) - F('id'), models.CharField()), 10, Value('0'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_step_gap_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='profundidade'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='api.comment', verbose_name='resposta a'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, max_length=255, verbose_name='caminho'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='total de respostas'),
+        ),
+        migrations.RunPython(fill_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['recipe', 'path'], name='comment_recipe_path_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:15
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_follow_counts(apps, schema_editor):
+    User = apps.get_model('api', 'User')
+    Follow = User.following.through
+
+    def total(column):
+        counts = Follow.objects.filter(**{column: OuterRef('pk')}).order_by().values(column).annotate(n=Count('pk')).values('n')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    User.objects.update(followers_count=total('to_user'), following_count=total('from_user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_notification_group_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='seguidores'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='seguindo'),
+        ),
+        migrations.RunPython(fill_follow_counts, migrations.RunPython.noop),
+    ]
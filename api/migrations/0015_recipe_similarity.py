@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_user_follow_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='posição')),
+                ('score', models.FloatField(verbose_name='similaridade')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarities', to='api.recipe', verbose_name='receita')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.recipe', verbose_name='receita parecida')),
+            ],
+            options={
+                'verbose_name': 'similaridade de receitas',
+                'verbose_name_plural': 'similaridades de receitas',
+                'ordering': ['recipe_id', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'rank'), name='similarity_recipe_rank_unique')],
+            },
+        ),
+    ]
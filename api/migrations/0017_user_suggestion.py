@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_notification_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='posição')),
+                ('score', models.FloatField(verbose_name='pontuação')),
+                ('suggested', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='usuário sugerido')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions', to=settings.AUTH_USER_MODEL, verbose_name='usuário')),
+            ],
+            options={
+                'verbose_name': 'sugestão de usuário',
+                'verbose_name_plural': 'sugestões de usuários',
+                'ordering': ['user_id', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'rank'), name='suggestion_user_rank_unique')],
+            },
+        ),
+    ]
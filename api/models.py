@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractUser
@@ -60,6 +61,12 @@ class User(AbstractUser):
         blank=True
     )
     avatar_url = models.URLField(_('URL do Avatar'), blank=True)
+    # Autores com seguidores demais não têm as receitas copiadas para as
+    # timelines; o feed busca as receitas deles na leitura (api/feed.py)
+    fanout_on_read = models.BooleanField(_('feed montado na leitura'), default=False)
+    # Mantidos com F() pelo sinal de `following` (api/follows.py)
+    followers_count = models.PositiveIntegerField(_('seguidores'), default=0)
+    following_count = models.PositiveIntegerField(_('seguindo'), default=0)
 
     groups = models.ManyToManyField(
         'auth.Group',
@@ -79,6 +86,19 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    # Escritos só com UPDATE/F() (api/follows.py e api/feed.py); um save()
+    # completo de uma instância antiga, como a do cache de autenticação,
+    # gravaria de volta valores vencidos
+    MAINTAINED_FIELDS = ('fanout_on_read', 'followers_count', 'following_count')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.username
 
@@ -97,14 +117,47 @@ class Recipe(models.Model):
     created_at = models.DateTimeField(_('criado em'), auto_now_add=True)
     updated_at = models.DateTimeField(_('atualizado em'), auto_now=True)
 
+    # Agregados das avaliações, mantidos com F() em `api.ratings`
+    rating_count = models.PositiveIntegerField(_('total de avaliações'), default=0)
+    rating_sum = models.PositiveIntegerField(_('soma das avaliações'), default=0)
+    rating_1 = models.PositiveIntegerField(_('avaliações com 1 estrela'), default=0)
+    rating_2 = models.PositiveIntegerField(_('avaliações com 2 estrelas'), default=0)
+    rating_3 = models.PositiveIntegerField(_('avaliações com 3 estrelas'), default=0)
+    rating_4 = models.PositiveIntegerField(_('avaliações com 4 estrelas'), default=0)
+    rating_5 = models.PositiveIntegerField(_('avaliações com 5 estrelas'), default=0)
+
     class Meta:
         verbose_name = _('receita')
         verbose_name_plural = _('receitas')
         ordering = ['-created_at']
+        # Colunas em ordem crescente: no SQLite o rowid (id) vai implícito no
+        # fim do índice, e a varredura reversa entrega (-created_at, -id).
+        indexes = [
+            models.Index(fields=['created_at'], name='recipe_created_idx'),
+            models.Index(fields=['difficulty', 'created_at'], name='recipe_difficulty_idx'),
+            models.Index(fields=['state', 'created_at'], name='recipe_state_idx'),
+            models.Index(fields=['difficulty', 'state', 'created_at'], name='recipe_difficulty_state_idx'),
+            # Sorteio por id (receita aleatória) com os mesmos filtros
+            models.Index(fields=['difficulty', 'id'], name='recipe_difficulty_id_idx'),
+            models.Index(fields=['state', 'id'], name='recipe_state_id_idx'),
+            models.Index(fields=['difficulty', 'state', 'id'], name='recipe_difficulty_state_id_idx'),
+            # Receitas recentes de um autor (parte do feed lida na hora)
+            models.Index(fields=['author', 'created_at'], name='recipe_author_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def avg_rating(self):
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 2)
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}') for star in range(1, 6)}
+
 
 class Ingredient(models.Model):
     """
@@ -156,9 +209,13 @@ class PreparationStep(models.Model):
         verbose_name = _('passo de preparo')
         verbose_name_plural = _('passos de preparo')
         ordering = ['order']
+        constraints = [
+            # `order` é uma chave esparsa (ver api/steps.py), não a posição exibida
+            models.UniqueConstraint(fields=['recipe', 'order'], name='step_recipe_order_unique'),
+        ]
 
     def __str__(self):
-        return f"Passo {self.order} - {self.description[:50]}..."
+        return f"{self.description[:50]}..."
 
 
 class Comment(models.Model):
@@ -183,10 +240,28 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    # Respostas: caminho materializado mantido em `api.threads`
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies',
+        verbose_name=_('resposta a')
+    )
+    path = models.CharField(_('caminho'), max_length=255, blank=True)
+    depth = models.PositiveSmallIntegerField(_('profundidade'), default=0)
+    reply_count = models.PositiveIntegerField(_('total de respostas'), default=0)
+
     class Meta:
         verbose_name = _('comentário')
         verbose_name_plural = _('comentários')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipe', 'created_at'], name='comment_recipe_created_idx'),
+            # Uma página de threads é um intervalo contínuo deste índice
+            models.Index(fields=['recipe', 'path'], name='comment_recipe_path_idx'),
+        ]
 
     def __str__(self):
         return f"Comentário de {self.user} em {self.recipe}"
@@ -330,6 +405,9 @@ class Report(models.Model):
     class Meta:
         verbose_name = _('denúncia')
         verbose_name_plural = _('denúncias')
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='report_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"Denúncia de {self.user} sobre {self.get_content_type_display()}"
@@ -366,15 +444,234 @@ class Notification(models.Model):
         blank=True,
         null=True
     )
+    # Alvo das notificações agrupadas (ex.: 'recipe:12'); vazio nas avulsas
+    group_key = models.CharField(
+        _('chave de agrupamento'),
+        max_length=64,
+        blank=True
+    )
     created_at = models.DateTimeField(
         _('criado em'),
         auto_now_add=True
     )
+    # Avança quando um evento é agrupado na notificação; ordena a lista
+    updated_at = models.DateTimeField(
+        _('atualizado em'),
+        default=timezone.now
+    )
 
     class Meta:
         verbose_name = _('notificação')
         verbose_name_plural = _('notificações')
-        ordering = ['-created_at']
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['user', 'read', 'updated_at'], name='notification_user_read_idx'),
+            # O SQLite não usa o índice acima para `NOT read`; o badge e a lista
+            # de não lidas usam este parcial
+            models.Index(fields=['user', 'updated_at'], condition=models.Q(read=False), name='notification_unread_idx'),
+            # Lista sem filtro de lida
+            models.Index(fields=['user', 'updated_at'], name='notification_user_updated_idx'),
+            # Notificação agrupada ainda aberta (não lida) para o mesmo alvo
+            models.Index(fields=['user', 'group_key', 'created_at'], condition=models.Q(read=False), name='notification_unread_group_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notificação {self.get_type_display()} para {self.user}"
+
+
+class SearchDocumentField(models.TextField):
+    """
+    Coluna oculta do FTS5 que tem o mesmo nome da tabela.
+    Só serve para o lookup `match`, que busca em todas as colunas do índice.
+    """
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class RecipeSearchIndex(models.Model):
+    """
+    Índice textual das receitas (tabela virtual FTS5 do SQLite).
+
+    Não é gerenciado pelo Django: a tabela é criada na migração e mantida
+    pelos sinais em `api.signals`. O `rowid` é o id da receita e `rank` é o
+    BM25 calculado pelo SQLite em consultas com MATCH.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index'
+    )
+    title = models.TextField(_('título'))
+    ingredients = models.TextField(_('ingredientes'))
+    steps = models.TextField(_('passos'))
+    document = SearchDocumentField(db_column='api_recipe_fts')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'api_recipe_fts'
+
+
+class IngredientPosting(models.Model):
+    """
+    Lista de postagens do índice invertido de ingredientes.
+
+    `TERMO` guarda as receitas que usam um ingrediente normalizado e
+    `TAMANHO` as receitas com aquela quantidade de ingredientes distintos,
+    que é o denominador da cobertura. Os ids ficam compactados em
+    `postings`: vetor de inteiros de 32 bits ordenado ou bitset, o que for
+    menor (veja `api.ingredient_index`).
+    """
+
+    class Kind(models.TextChoices):
+        TERM = 'TERMO', _('Termo')
+        SIZE = 'TAMANHO', _('Tamanho')
+
+    kind = models.CharField(
+        _('tipo'),
+        max_length=7,
+        choices=Kind.choices
+    )
+    key = models.CharField(
+        _('chave'),
+        max_length=255
+    )
+    recipe_count = models.PositiveIntegerField(
+        _('quantidade de receitas'),
+        default=0
+    )
+    dense = models.BooleanField(
+        _('bitset'),
+        default=False
+    )
+    postings = models.BinaryField(
+        _('postagens'),
+        default=bytes
+    )
+
+    class Meta:
+        verbose_name = _('postagem de ingrediente')
+        verbose_name_plural = _('postagens de ingredientes')
+        unique_together = ('kind', 'key')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.key} ({self.recipe_count} receitas)"
+
+
+class TimelineEntry(models.Model):
+    """
+    Receita de quem o usuário segue, copiada para a timeline dele quando é
+    publicada (fan-out na escrita). `author` e `created_at` repetem os da
+    receita para o feed ler e filtrar só por esta tabela.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name=_('usuário')
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name=_('receita')
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('autor')
+    )
+    created_at = models.DateTimeField(_('criado em'))
+
+    class Meta:
+        verbose_name = _('entrada da timeline')
+        verbose_name_plural = _('entradas da timeline')
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'recipe'), name='timeline_user_recipe_unique'),
+        ]
+        indexes = [
+            # Página do feed: (-created_at, -recipe_id) é a varredura reversa deste índice
+            models.Index(fields=['user', 'created_at', 'recipe'], name='timeline_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} na timeline de {self.user}"
+
+
+class RecipeSimilarity(models.Model):
+    """
+    Receitas parecidas pelo comportamento dos usuários ("quem gostou desta
+    também gostou de..."), geradas pelo comando `build_recommendations`.
+    `rank` 1 é a mais parecida.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarities',
+        verbose_name=_('receita')
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('receita parecida')
+    )
+    rank = models.PositiveSmallIntegerField(_('posição'))
+    score = models.FloatField(_('similaridade'))
+
+    class Meta:
+        verbose_name = _('similaridade de receitas')
+        verbose_name_plural = _('similaridades de receitas')
+        ordering = ['recipe_id', 'rank']
+        constraints = [
+            # `recipes/<id>/similar` é um intervalo deste índice, já na ordem
+            models.UniqueConstraint(fields=('recipe', 'rank'), name='similarity_recipe_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.similar} parecida com {self.recipe} ({self.score:.2f})"
+
+
+class UserSuggestion(models.Model):
+    """
+    Sugestões de quem seguir, geradas pelo comando `build_suggestions` a
+    partir do grafo de seguidores (api/suggestions.py). `rank` 1 é a de maior
+    pontuação.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggestions',
+        verbose_name=_('usuário')
+    )
+    suggested = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('usuário sugerido')
+    )
+    rank = models.PositiveSmallIntegerField(_('posição'))
+    score = models.FloatField(_('pontuação'))
+
+    class Meta:
+        verbose_name = _('sugestão de usuário')
+        verbose_name_plural = _('sugestões de usuários')
+        ordering = ['user_id', 'rank']
+        constraints = [
+            # `users/suggestions/` é um intervalo deste índice, já na ordem
+            models.UniqueConstraint(fields=('user', 'rank'), name='suggestion_user_rank_unique'),
+        ]
 
     def __str__(self):
-        return f"Notificação {self.get_type_display()} para {self.user}"
\ No newline at end of file
+        return f"{self.suggested} para {self.user} ({self.score:.2f})"
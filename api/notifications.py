@@ -0,0 +1,279 @@
+"""
+Fila de notificações.
+
+As views só enfileiram um evento leve (`notify`); um worker em thread
+separada junta os eventos e grava as Notification com `bulk_create` em
+lotes de até BATCH_SIZE ou a cada FLUSH_INTERVAL segundos. O evento entra na
+fila no commit da transação da view, então ação desfeita não notifica.
+
+A fila é em memória do processo: o que ainda não foi gravado se perde se o
+processo morrer, o que é aceitável para notificações. Com a fila cheia o
+evento é gravado na hora. Com NOTIFICATIONS['ASYNC'] falso não há worker e
+cada evento é gravado no próprio commit (testes e scripts).
+
+O total de não lidas (badge) fica no cache por usuário: a primeira leitura
+conta no banco e guarda, as gravações somam com `incr` e marcar como lida
+apaga a chave. O valor expira em UNREAD_TIMEOUT segundos, o que corrige
+qualquer desvio de corridas entre contagem e gravação.
+
+Avaliações, favoritos e seguidores são agrupados na gravação: eventos do
+mesmo tipo e alvo (a receita, ou o próprio usuário para seguidores) dentro
+de AGGREGATE_WINDOW segundos viram uma única notificação não lida, com
+`count` e uma amostra de até AGGREGATE_SAMPLE `actor_ids` (os mais
+recentes primeiro) atualizados no lugar, e `updated_at` avança para a
+notificação voltar ao topo da lista. A janela conta de `created_at`. Depois
+de lida, o próximo evento abre outra notificação.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import Notification
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ASYNC': True,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'MAX_QUEUE': 10000,
+    'CACHE_ALIAS': 'default',
+    'UNREAD_TIMEOUT': 300,
+    'MARK_READ_BATCH': 1000,
+    'AGGREGATE_WINDOW': 3600,
+    'AGGREGATE_SAMPLE': 5,
+}
+
+Type = Notification.NotificationType
+AGGREGATED = {Type.RATING, Type.FAVORITE, Type.FOLLOWER}
+
+_events = None
+_worker = None
+_lock = threading.Lock()
+
+
+def _setting(name):
+    return getattr(settings, 'NOTIFICATIONS', {}).get(name, DEFAULTS[name])
+
+
+def _queue():
+    global _events
+    if _events is None:
+        with _lock:
+            if _events is None:
+                _events = queue.Queue(maxsize=_setting('MAX_QUEUE'))
+    return _events
+
+
+def notify(user_id, type, actor, **data):
+    """
+    Agenda a notificação `type` para `user_id` sobre a ação de `actor`;
+    `data` completa o JSON (ids da receita, do comentário...). Quem age sobre
+    o próprio conteúdo não é notificado.
+    """
+    if user_id == actor.pk:
+        return
+    event = (user_id, type, {'actor_id': actor.pk, 'actor': actor.username, **data})
+    transaction.on_commit(lambda: _enqueue(event), robust=True)
+
+
+def _enqueue(event):
+    if not _setting('ASYNC'):
+        write([event])
+        return
+    _start_worker()
+    try:
+        _queue().put_nowait(event)
+    except queue.Full:
+        write([event])
+
+
+def write(events):
+    """
+    Grava os eventos `(user_id, type, data)` como notificações, agrupando os
+    tipos de AGGREGATED nas notificações abertas do mesmo alvo.
+    """
+    created, groups = [], {}
+    for user_id, type, data in events:
+        if type not in AGGREGATED:
+            created.append(Notification(user_id=user_id, type=type, data=data))
+            continue
+        key = (user_id, type, group_key(data))
+        event = _single(data)
+        groups[key] = _merge(groups[key], event) if key in groups else event
+
+    with transaction.atomic():
+        updated = []
+        now = timezone.now()
+        open_rows = _open_groups(groups)
+        for (user_id, type, key), data in groups.items():
+            row = open_rows.get((user_id, type, key))
+            if row is None:
+                created.append(Notification(user_id=user_id, type=type, group_key=key, data=data))
+            else:
+                row.data = _merge(row.data, data)
+                row.updated_at = now
+                updated.append(row)
+        Notification.objects.bulk_create(created, batch_size=_setting('BATCH_SIZE'))
+        Notification.objects.bulk_update(updated, ['data', 'updated_at'], batch_size=_setting('BATCH_SIZE'))
+    # Agrupar numa notificação aberta não muda o total de não lidas
+    _add_unread(Counter(notification.user_id for notification in created))
+
+
+def group_key(data):
+    recipe_id = data.get('recipe_id')
+    return f'recipe:{recipe_id}' if recipe_id is not None else 'user'
+
+
+def _single(data):
+    return {**data, 'count': 1, 'actor_ids': [data['actor_id']]}
+
+
+def _merge(older, newer):
+    """Soma `newer` em `older`; os demais campos ficam com os do evento mais novo."""
+    actor_ids = list(dict.fromkeys(newer['actor_ids'] + older['actor_ids']))
+    return {
+        **older,
+        **newer,
+        'count': older['count'] + newer['count'],
+        'actor_ids': actor_ids[:_setting('AGGREGATE_SAMPLE')],
+    }
+
+
+def _open_groups(groups):
+    """Notificações não lidas da janela para as chaves `(user_id, type, group_key)`."""
+    if not groups:
+        return {}
+    cutoff = timezone.now() - timedelta(seconds=_setting('AGGREGATE_WINDOW'))
+    user_ids, types, keys = (set(values) for values in zip(*groups))
+    rows = Notification.objects.select_for_update().filter(
+        user_id__in=user_ids, group_key__in=keys, type__in=types, read=False, created_at__gte=cutoff,
+    ).order_by('created_at')
+    # Se houver mais de uma aberta para a chave, vale a mais nova
+    return {
+        (row.user_id, row.type, row.group_key): row
+        for row in rows
+        if (row.user_id, row.type, row.group_key) in groups
+    }
+
+
+def _cache():
+    return caches[_setting('CACHE_ALIAS')]
+
+
+def _unread_key(user_id):
+    return f'notifications:{user_id}:unread'
+
+
+def _add_unread(counts):
+    # Só soma em contadores que já estão no cache; os demais contam na próxima leitura
+    cache = _cache()
+    for user_id, count in counts.items():
+        try:
+            cache.incr(_unread_key(user_id), count)
+        except ValueError:
+            pass
+
+
+def unread_count(user_id):
+    """Total de notificações não lidas do usuário (cache, com o banco como fallback)."""
+    cache = _cache()
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, read=False).count()
+        cache.add(key, count, _setting('UNREAD_TIMEOUT'))
+    return count
+
+
+def mark_read(user_id, up_to=None, seen_at=None):
+    """
+    Marca como lidas as não lidas do usuário com UPDATEs de até
+    MARK_READ_BATCH linhas, cada um em sua transação. Com `up_to`, só as que
+    vêm até essa notificação na ordem da lista, `(updated_at, id)`; `seen_at`
+    é o `updated_at` dela que o cliente viu (senão vale o atual). Retorna
+    quantas foram marcadas.
+    """
+    unread = Notification.objects.filter(user_id=user_id, read=False)
+    if up_to is not None:
+        if seen_at is None:
+            seen_at = Notification.objects.filter(user_id=user_id, pk=up_to).values_list('updated_at', flat=True).first()
+            if seen_at is None:
+                return 0
+        # Agrupadas depois do que o cliente viu têm updated_at maior e ficam não lidas
+        unread = unread.filter(Q(updated_at__lt=seen_at) | Q(updated_at=seen_at, pk__lte=up_to))
+    batch_size = _setting('MARK_READ_BATCH')
+
+    total = 0
+    while True:
+        ids = list(unread.order_by().values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        total += Notification.objects.filter(pk__in=ids, read=False).update(read=True)
+        if len(ids) < batch_size:
+            break
+    if total:
+        _cache().delete(_unread_key(user_id))
+    return total
+
+
+def _drain(limit, timeout=None):
+    events = _queue()
+    batch = []
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while len(batch) < limit:
+        try:
+            if deadline is None:
+                batch.append(events.get_nowait())
+            else:
+                batch.append(events.get(timeout=max(deadline - time.monotonic(), 0)))
+        except queue.Empty:
+            break
+    return batch
+
+
+def flush():
+    """Grava tudo o que está na fila agora; retorna quantos eventos saíram."""
+    total = 0
+    while True:
+        batch = _drain(_setting('BATCH_SIZE'))
+        if not batch:
+            return total
+        write(batch)
+        total += len(batch)
+
+
+def _run():
+    events = _queue()
+    while True:
+        first = events.get()
+        batch = [first] + _drain(_setting('BATCH_SIZE') - 1, timeout=_setting('FLUSH_INTERVAL'))
+        try:
+            write(batch)
+        except Exception:
+            logger.exception("Falha ao gravar %d notificações", len(batch))
+        finally:
+            close_old_connections()
+
+
+def _start_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='notifications', daemon=True)
+            _worker.start()
+
+
+atexit.register(flush)
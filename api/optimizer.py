@@ -0,0 +1,62 @@
+"""
+Monta select_related/prefetch_related a partir dos campos de um serializer,
+para que as listagens façam um número fixo de consultas (sem N+1).
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+
+
+def _related_lookups(serializer, prefix='', prefetch_only=False):
+    select, prefetch = [], []
+    model = serializer.Meta.model
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        name = field.source.split('.')[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+
+        path = prefix + name
+        if isinstance(field, PrimaryKeyRelatedField):
+            # FK exibida só pelo id: `author_id` já vem na linha
+            continue
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        many = isinstance(field, (ManyRelatedField, serializers.ListSerializer)) or model_field.one_to_many or model_field.many_to_many
+
+        if many or prefetch_only:
+            prefetch.append(path)
+        else:
+            select.append(path)
+
+        if isinstance(nested, serializers.ModelSerializer):
+            nested_select, nested_prefetch = _related_lookups(nested, f'{path}__', prefetch_only=many or prefetch_only)
+            select += nested_select
+            prefetch += nested_prefetch
+
+    return select, prefetch
+
+
+@lru_cache(maxsize=None)
+def related_lookups(serializer_class):
+    """Retorna `(select_related, prefetch_related)` usados pelo serializer."""
+    select, prefetch = _related_lookups(serializer_class())
+    return tuple(select), tuple(prefetch)
+
+
+def optimize_queryset(queryset, serializer_class):
+    """Aplica os joins e prefetches que `serializer_class` vai precisar."""
+    select, prefetch = related_lookups(serializer_class)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
@@ -0,0 +1,245 @@
+import base64
+import binascii
+import datetime
+import decimal
+import heapq
+import json
+from itertools import islice
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sem COUNT(*) nem OFFSET.
+
+    O cursor é opaco e guarda os valores de `ordering` do item de borda da
+    página, então páginas profundas custam o mesmo que a primeira. O último
+    campo de `ordering` precisa ser único (normalmente o `id`).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.start_page(request)
+        return self.finish_page(self.fetch(queryset))
+
+    def start_page(self, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+
+    def fetch(self, queryset):
+        """Até `page_size + 1` itens a partir da posição do cursor, já na ordem de leitura."""
+        if self.position is not None:
+            position = self.clean_position(queryset, self.position)
+            queryset = queryset.filter(self.get_position_filter(position, self.reverse))
+        ordering = self.get_ordering(self.reverse)
+        return list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+    def finish_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_previous = has_more
+            self.has_next = self.position is not None
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            size = int(value)
+        except ValueError:
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return list(self.ordering)
+        return [field[1:] if field.startswith('-') else '-' + field for field in self.ordering]
+
+    def get_position_filter(self, position, reverse):
+        """
+        Monta `(a, b, ...) < (x, y, ...)` (ou `>`) como Q.
+
+        A primeira coluna vai repetida como intervalo inclusivo para o banco
+        conseguir buscar direto no índice em vez de percorrê-lo desde o início.
+        """
+        fields = [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+        lookups = []
+        for name, descending in fields:
+            before = descending != reverse
+            lookups.append((name, 'lt' if before else 'gt', 'lte' if before else 'gte'))
+
+        condition = Q()
+        for index, (name, strict, _) in enumerate(lookups):
+            term = Q(**{f'{name}__{strict}': position[index]})
+            for previous, (previous_name, _, _) in enumerate(lookups[:index]):
+                term &= Q(**{previous_name: position[previous]})
+            condition |= term
+
+        first_name, _, inclusive = lookups[0]
+        return Q(**{f'{first_name}__{inclusive}': position[0]}) & condition
+
+    def clean_position(self, queryset, position):
+        """
+        Converte os valores do cursor com os campos de `ordering` (do modelo ou
+        anotados no queryset); valor que não converte é cursor forjado.
+        """
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            try:
+                if name in queryset.query.annotations:
+                    model_field = queryset.query.annotations[name].output_field
+                else:
+                    model_field = queryset.model._meta.get_field(name)
+                if value is None or isinstance(value, (list, dict)):
+                    raise ValidationError(name)
+                cleaned.append(model_field.to_python(value))
+            except (FieldDoesNotExist, ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def get_position(self, instance):
+        return [self._encode_value(getattr(instance, field.lstrip('-'))) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            reverse = bool(payload.get('r', 0))
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def _encode_value(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+
+class SearchRankPagination(KeysetPagination):
+    """
+    Pagina resultados da busca textual pela relevância anotada em
+    `search_rank` (BM25 do FTS5, menor é melhor).
+    """
+    ordering = ('search_rank', 'id')
+
+
+class ThreadPagination(KeysetPagination):
+    """
+    Pagina comentários em ordem de thread pelo caminho materializado (único),
+    então cada página é um intervalo contínuo do índice `(recipe, path)`.
+    """
+    ordering = ('path',)
+
+
+class FollowPagination(KeysetPagination):
+    """
+    Pagina linhas da tabela de `User.following`, de quem seguiu por último
+    para o primeiro (o id da linha cresce com o tempo).
+    """
+    ordering = ('-id',)
+
+
+class NotificationPagination(KeysetPagination):
+    """
+    Pagina notificações pela última atualização: uma notificação agrupada
+    que recebe um evento novo volta para o topo.
+    """
+    ordering = ('-updated_at', '-id')
+
+
+class MergedKeysetPagination(KeysetPagination):
+    """
+    Monta uma página a partir de vários querysets com a mesma ordenação
+    (todos os campos no mesmo sentido). Cada um é lido pelo próprio índice até
+    `page_size + 1` itens e as listas são intercaladas em memória; os itens
+    precisam ter os atributos de `ordering`, mesmo que vindos de modelos
+    diferentes.
+    """
+
+    def paginate_querysets(self, querysets, request):
+        self.start_page(request)
+        names = [field.lstrip('-') for field in self.ordering]
+        descending = self.ordering[0].startswith('-') != self.reverse
+        merged = heapq.merge(
+            *(self.fetch(queryset) for queryset in querysets),
+            key=lambda item: tuple(getattr(item, name) for name in names),
+            reverse=descending,
+        )
+        return self.finish_page(list(islice(merged, self.page_size + 1)))
+
+
+class FeedPagination(MergedKeysetPagination):
+    """
+    Pagina o feed juntando a timeline gravada (TimelineEntry) com as
+    receitas dos autores lidos na hora (Recipe anotada com `recipe_id`).
+    """
+    ordering = ('-created_at', '-recipe_id')
@@ -0,0 +1,57 @@
+"""
+Agregados de avaliação desnormalizados em `Recipe`.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import Rating, Recipe
+
+
+def apply_rating_change(recipe_id, previous, current):
+    """
+    Atualiza contagem, soma e histograma em um único UPDATE com F().
+    `previous`/`current` são as notas antes e depois (None = não existe).
+    Também avança `updated_at`, que versiona as respostas da receita.
+    """
+    if previous == current:
+        return
+
+    changes = {'updated_at': timezone.now()}
+    if previous is None:
+        changes['rating_count'] = F('rating_count') + 1
+    elif current is None:
+        changes['rating_count'] = F('rating_count') - 1
+
+    delta = (current or 0) - (previous or 0)
+    if delta:
+        changes['rating_sum'] = F('rating_sum') + delta
+    if previous is not None:
+        changes[f'rating_{previous}'] = F(f'rating_{previous}') - 1
+    if current is not None:
+        changes[f'rating_{current}'] = F(f'rating_{current}') + 1
+
+    Recipe.objects.filter(pk=recipe_id).update(**changes)
+
+
+def reconcile(queryset=None):
+    """
+    Recalcula os agregados a partir da tabela de avaliações com um único
+    UPDATE (subconsultas correlacionadas). Retorna as receitas atualizadas.
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+
+    ratings = Rating.objects.filter(recipe=OuterRef('pk')).order_by().values('recipe')
+
+    def aggregate(expression):
+        subquery = Subquery(ratings.annotate(value=expression).values('value'), output_field=IntegerField())
+        return Coalesce(subquery, Value(0))
+
+    values = {
+        'rating_count': aggregate(Count('id')),
+        'rating_sum': aggregate(Sum('rating')),
+    }
+    for star in range(1, 6):
+        values[f'rating_{star}'] = aggregate(Count('id', filter=Q(rating=star)))
+    return queryset.update(**values)
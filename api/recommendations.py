@@ -0,0 +1,103 @@
+"""
+Recomendações item a item ("quem gostou desta também gostou de...").
+
+`build` monta uma matriz esparsa usuário x receita com o sinal de Rating e
+Favorite (nota/5, mais 1 se favoritou), normaliza as colunas e calcula a
+similaridade do cosseno entre receitas com produtos esparsos do SciPy, em
+blocos de `chunk_size` receitas para a matriz densa nunca aparecer. De cada
+linha ficam as `top_n` mais parecidas com pelo menos `min_support` usuários
+em comum, gravadas em RecipeSimilarity numa única transação (a tabela é
+trocada inteira).
+"""
+from django.db import transaction
+
+from api.models import Favorite, Rating, RecipeSimilarity
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - depende do ambiente
+    np = sparse = None
+
+
+def is_available():
+    """O cálculo depende do NumPy e do SciPy."""
+    return sparse is not None
+
+
+def interaction_matrix():
+    """`(matriz usuário x receita, ids das receitas das colunas)`."""
+    ratings = np.array(list(Rating.objects.values_list('user_id', 'recipe_id', 'rating')), dtype=np.float64).reshape(-1, 3)
+    favorites = np.array(list(Favorite.objects.values_list('user_id', 'recipe_id')), dtype=np.float64).reshape(-1, 2)
+
+    users = np.concatenate([ratings[:, 0], favorites[:, 0]]).astype(np.int64)
+    recipes = np.concatenate([ratings[:, 1], favorites[:, 1]]).astype(np.int64)
+    values = np.concatenate([ratings[:, 2] / 5, np.ones(len(favorites))])
+
+    user_ids, rows = np.unique(users, return_inverse=True)
+    recipe_ids, cols = np.unique(recipes, return_inverse=True)
+    # Entradas repetidas (avaliou e favoritou) são somadas na conversão
+    matrix = sparse.coo_matrix((values, (rows, cols)), shape=(len(user_ids), len(recipe_ids))).tocsr()
+    return matrix, recipe_ids
+
+
+def top_similar(matrix, top_n=20, min_support=2, chunk_size=1000):
+    """
+    Gera `(coluna, [(coluna parecida, score), ...])` para cada receita com
+    vizinhas, da mais parecida para a menos.
+    """
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    norms[norms == 0] = 1
+    normalized = (matrix @ sparse.diags(1 / norms)).tocsc()
+    binary = (matrix > 0).astype(np.int32).tocsc()
+    items = normalized.shape[1]
+
+    for start in range(0, items, chunk_size):
+        end = min(start + chunk_size, items)
+        scores = (normalized[:, start:end].T @ normalized).tocsr()
+        support = (binary[:, start:end].T @ binary).tocsr()
+        # Valores não negativos: as duas matrizes têm o mesmo padrão de não
+        # zeros, então com índices ordenados as linhas se alinham posição a posição
+        scores.sort_indices()
+        support.sort_indices()
+
+        for offset in range(end - start):
+            column = start + offset
+            low, high = scores.indptr[offset], scores.indptr[offset + 1]
+            columns, values = scores.indices[low:high], scores.data[low:high]
+            common = support.data[low:high]
+            keep = (columns != column) & (common >= min_support) & (values > 0)
+            columns, values = columns[keep], values[keep]
+            if not len(columns):
+                continue
+            if len(columns) > top_n:
+                best = np.argpartition(-values, top_n - 1)[:top_n]
+                columns, values = columns[best], values[best]
+            order = np.lexsort((columns, -values))
+            yield column, list(zip(columns[order].tolist(), values[order].tolist()))
+
+
+def build(top_n=20, min_support=2, chunk_size=1000, batch_size=2000):
+    """Recalcula e grava a tabela de similaridades; retorna quantas linhas foram gravadas."""
+    matrix, recipe_ids = interaction_matrix()
+    total = 0
+    with transaction.atomic():
+        RecipeSimilarity.objects.all().delete()
+        if not matrix.nnz:
+            return 0
+        batch = []
+        for column, neighbours in top_similar(matrix, top_n, min_support, chunk_size):
+            batch += [
+                RecipeSimilarity(
+                    recipe_id=int(recipe_ids[column]), similar_id=int(recipe_ids[other]),
+                    rank=rank, score=round(score, 6),
+                )
+                for rank, (other, score) in enumerate(neighbours, start=1)
+            ]
+            if len(batch) >= batch_size:
+                RecipeSimilarity.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        RecipeSimilarity.objects.bulk_create(batch)
+        total += len(batch)
+    return total
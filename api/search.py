@@ -0,0 +1,95 @@
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Value
+
+FTS_TABLE = 'api_recipe_fts'
+
+_DOCUMENTS_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, ingredients, steps)
+    SELECT r.id,
+           r.title,
+           COALESCE((SELECT group_concat(i.name, ' ') FROM api_ingredient i WHERE i.recipe_id = r.id), ''),
+           COALESCE((SELECT group_concat(s.description, ' ') FROM api_preparationstep s WHERE s.recipe_id = r.id), '')
+    FROM api_recipe r
+"""
+
+
+def is_available():
+    """O índice FTS5 só existe no SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(text, column=None):
+    """
+    Converte o texto digitado em uma expressão FTS5 segura.
+
+    Cada palavra vira um prefixo entre aspas (`"feij"*`), então operadores e
+    aspas digitados pelo usuário nunca chegam ao parser do FTS5. Acentos são
+    removidos pelo tokenizador `unicode61 remove_diacritics 2`.
+    """
+    terms = ' '.join(f'"{token}"*' for token in re.findall(r'\w+', text or ''))
+    if not terms or column is None:
+        return terms
+    return f'{column} : ({terms})'
+
+
+def filter_recipes(queryset, q=None, title=None):
+    """
+    Filtra receitas pelo índice textual e anota `search_rank` (BM25, menor é melhor).
+
+    `q` busca em título, ingredientes e passos; `title` só no título. Sem
+    FTS5 disponível, cai para `icontains` no título.
+    """
+    if not is_available():
+        for text in (q, title):
+            if text:
+                queryset = queryset.filter(title__icontains=text)
+        return queryset
+
+    expressions = [expr for expr in (match_expression(q), match_expression(title, 'title')) if expr]
+    if not expressions:
+        # Só pontuação: nenhum resultado, mas com a mesma anotação para a paginação por relevância
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.filter(
+        search_index__document__match=' AND '.join(f'({expr})' for expr in expressions)
+    ).annotate(search_rank=F('search_index__rank'))
+
+
+def index_recipes(recipe_ids):
+    """Recalcula as linhas do índice das receitas informadas."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or not is_available():
+        return
+
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', recipe_ids)
+        cursor.execute(f'{_DOCUMENTS_SQL} WHERE r.id IN ({placeholders})', recipe_ids)
+
+
+def remove_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or not is_available():
+        return
+
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', recipe_ids)
+
+
+def rebuild_index():
+    """
+    Reconstrói o índice inteiro com um único INSERT ... SELECT e compacta
+    os segmentos do FTS5 no final. Retorna a quantidade de receitas indexadas.
+    """
+    if not is_available():
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(_DOCUMENTS_SQL)
+        indexed = cursor.rowcount
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return indexed
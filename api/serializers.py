@@ -1,11 +1,11 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import User, Recipe, Comment, Ingredient
+from .models import User, Recipe, Comment, Ingredient, Media, RecipeSimilarity
 
 from .models import PreparationStep
 
 from rest_framework import serializers
-from api.models import Rating
+from api.models import Rating, Notification
 
 # Serializer para registro de usuário
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -57,8 +57,17 @@ class UserLoginSerializer(serializers.Serializer):
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ('id', 'email', 'profile', 'state', 'avatar_url', 'following', 'followers')
-        read_only_fields = ('id', 'following', 'followers')
+        fields = ('id', 'email', 'profile', 'state', 'avatar_url', 'followers_count', 'following_count')
+        read_only_fields = ('id', 'followers_count', 'following_count')
+
+
+# Usuário embutido em outros payloads (autor da receita, listas de seguidores):
+# só os totais, as listas ficam nos endpoints paginados
+class UserSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('id', 'username', 'avatar_url', 'followers_count', 'following_count')
+        read_only_fields = fields
 
 
 class UserSerializerEdit(serializers.ModelSerializer):
@@ -79,31 +88,60 @@ class UserSerializerEdit(serializers.ModelSerializer):
             raise serializers.ValidationError("Este email já está em uso.")
         return value
 
+    def update(self, instance, validated_data):
+        # Grava só o que foi editado: o request.user pode ter vindo do cache
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        return instance
+
 
 # serializers.py
 class RecipeSerializer(serializers.ModelSerializer):
     author = serializers.PrimaryKeyRelatedField(read_only=True)
     ingredients = serializers.StringRelatedField(many=True, read_only=True)
     steps = serializers.StringRelatedField(many=True, read_only=True)  # 👈 mudou de preparation_steps para steps
+    avg_rating = serializers.FloatField(read_only=True)  # vem dos agregados da receita, sem consulta extra
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'author', 'title', 'difficulty', 'prep_time',
-            'ingredients', 'steps', 'state', 'created_at', 'updated_at'
+            'ingredients', 'steps', 'state', 'avg_rating', 'rating_count',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'author', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'author', 'rating_count', 'created_at', 'updated_at']
+
+
+# Receita parecida: só campos da própria linha, para sair de um único join
+class SimilarRecipeSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='similar.id', read_only=True)
+    title = serializers.CharField(source='similar.title', read_only=True)
+    difficulty = serializers.CharField(source='similar.difficulty', read_only=True)
+    prep_time = serializers.IntegerField(source='similar.prep_time', read_only=True)
+    avg_rating = serializers.FloatField(source='similar.avg_rating', read_only=True)
+    rating_count = serializers.IntegerField(source='similar.rating_count', read_only=True)
+
+    class Meta:
+        model = RecipeSimilarity
+        fields = ['id', 'title', 'difficulty', 'prep_time', 'avg_rating', 'rating_count', 'score']
+        read_only_fields = fields
 
 
 class RecipeDetailSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only=True)
+    author = UserSummarySerializer(read_only=True)
     ingredients = serializers.StringRelatedField(many=True, read_only=True)
     steps = serializers.StringRelatedField(many=True, read_only=True)
+    avg_rating = serializers.FloatField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = '__all__'
-        read_only_fields = ['id', 'author', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'author', 'rating_count', 'rating_sum', 'rating_1', 'rating_2',
+            'rating_3', 'rating_4', 'rating_5', 'created_at', 'updated_at'
+        ]
 
 
 # Para criar/editar ingrediente
@@ -114,6 +152,31 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
         
 
+# Para a edição em lote: itens com `id` atualizam, sem `id` criam
+class IngredientUpsertSerializer(IngredientSerializer):
+    id = serializers.IntegerField(required=False)
+
+    # Obrigatórios só para criar; com `id`, os campos ausentes ficam como estão
+    CREATE_REQUIRED = ('name', 'quantity')
+
+    class Meta(IngredientSerializer.Meta):
+        read_only_fields = []
+        extra_kwargs = {
+            'name': {'required': False},
+            'quantity': {'required': False},
+        }
+
+    def validate(self, attrs):
+        if 'id' not in attrs:
+            missing = {
+                field: [self.fields[field].error_messages['required']]
+                for field in self.CREATE_REQUIRED if field not in attrs
+            }
+            if missing:
+                raise serializers.ValidationError(missing)
+        return attrs
+
+
 # Para exibir ingrediente com recipe apenas como ID
 class IngredientListSerializer(serializers.ModelSerializer):
     class Meta:
@@ -145,12 +208,75 @@ class PreparationStepSerializer(serializers.ModelSerializer):
         return value
 
 
+# Para criar passos junto com a receita (a receita ainda não existe)
+class NestedPreparationStepSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PreparationStep
+        fields = ['order', 'description']
+
+    def validate_order(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("A ordem do passo deve ser maior que zero.")
+        return value
+
+
+# Operação de reordenação: mover um passo existente ou inserir um novo
+class StepOperationSerializer(serializers.Serializer):
+    step = serializers.IntegerField(required=False)
+    description = serializers.CharField(required=False)
+    after = serializers.IntegerField(required=False, allow_null=True, default=None)
+
+    def validate(self, data):
+        if ('step' in data) == ('description' in data):
+            raise serializers.ValidationError("Informe 'step' para mover ou 'description' para inserir.")
+        return data
+
+
+# Um item da criação em lote: receita com ingredientes e passos aninhados
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    ingredients = IngredientSerializer(many=True, required=False)
+    steps = NestedPreparationStepSerializer(many=True, required=False)
+
+    class Meta:
+        model = Recipe
+        fields = ['title', 'difficulty', 'prep_time', 'state', 'ingredients', 'steps']
+
+    def validate_steps(self, value):
+        orders = [step['order'] for step in value]
+        if len(orders) != len(set(orders)):
+            raise serializers.ValidationError("Os passos não podem repetir a ordem.")
+        return value
+
+
+class NestedMediaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Media
+        fields = ['url', 'type']
+
+
+# Uma linha do NDJSON do catálogo (api/catalog.py); o autor vai pelo email
+class RecipeCatalogSerializer(RecipeBulkSerializer):
+    author = serializers.EmailField(source='author.email', required=False)
+    media = NestedMediaSerializer(many=True, required=False)
+
+    class Meta(RecipeBulkSerializer.Meta):
+        fields = RecipeBulkSerializer.Meta.fields + ['author', 'media']
+
+
+# Autor resumido exibido em cada comentário
+class CommentAuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'avatar_url']
+
+
 class CommentSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField()
+    user = CommentAuthorSerializer(read_only=True)
 
     class Meta:
         model = Comment
-        fields = ['id', 'text', 'user', 'created_at']
+        fields = ['id', 'text', 'user', 'parent', 'depth', 'reply_count', 'created_at']
+        read_only_fields = ['parent', 'depth', 'reply_count']
 
 
 class RatingSerializer(serializers.ModelSerializer):
@@ -158,3 +284,10 @@ class RatingSerializer(serializers.ModelSerializer):
         model = Rating
         fields = ['id', 'rating', 'user', 'recipe']
         read_only_fields = ['id', 'user', 'recipe']
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'type', 'read', 'data', 'created_at', 'updated_at']
+        read_only_fields = fields
@@ -0,0 +1,150 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.contrib.auth.signals import user_logged_out
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api import authentication
+from api import cache as recipe_cache
+from api import bulk, feed, follows, ingredient_index, ratings, search, threads
+from api.conditional import touch_recipe
+from api.models import Comment, Ingredient, PreparationStep, Rating, Recipe, User
+
+
+def _cascading_from_recipe(origin):
+    return isinstance(origin, Recipe) or getattr(origin, 'model', None) is Recipe
+
+
+@receiver(post_save, sender=Recipe)
+def index_saved_recipe(sender, instance, **kwargs):
+    search.index_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out([instance])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_recipe_terms(sender, instance, **kwargs):
+    instance._ingredient_terms = ingredient_index.recipe_terms(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_deleted_recipe(sender, instance, **kwargs):
+    search.remove_recipes([instance.pk])
+    ingredient_index.sync_recipe(instance.pk, getattr(instance, '_ingredient_terms', set()), set())
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=PreparationStep)
+def index_recipe_children(sender, instance, **kwargs):
+    search.index_recipes([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=PreparationStep)
+def unindex_recipe_children(sender, instance, origin=None, **kwargs):
+    # Na exclusão em cascata da receita a linha some junto com ela
+    if _cascading_from_recipe(origin) or bulk.reindexing():
+        return
+    search.index_recipes([instance.recipe_id])
+
+
+@receiver(pre_save, sender=Ingredient)
+def remember_ingredient_name(sender, instance, **kwargs):
+    instance._previous_name = None
+    if instance.pk:
+        instance._previous_name = Ingredient.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Ingredient)
+def sync_saved_ingredient(sender, instance, **kwargs):
+    touched = {ingredient_index.normalize(instance.name)}
+    if getattr(instance, '_previous_name', None):
+        touched.add(ingredient_index.normalize(instance._previous_name))
+    ingredient_index.sync_recipe(instance.recipe_id, touched)
+
+
+@receiver(post_delete, sender=Ingredient)
+def sync_deleted_ingredient(sender, instance, origin=None, **kwargs):
+    if _cascading_from_recipe(origin) or bulk.reindexing():
+        return
+    ingredient_index.sync_recipe(instance.recipe_id, {ingredient_index.normalize(instance.name)})
+
+
+@receiver(post_delete, sender=Rating)
+def discount_deleted_rating(sender, instance, origin=None, **kwargs):
+    if _cascading_from_recipe(origin):
+        return
+    ratings.apply_rating_change(instance.recipe_id, instance.rating, None)
+    recipe_cache.invalidate_recipe(instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=PreparationStep)
+@receiver(post_save, sender=Comment)
+def touch_parent_recipe(sender, instance, **kwargs):
+    touch_recipe(instance.recipe_id)
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=PreparationStep)
+@receiver(post_delete, sender=Comment)
+def touch_parent_recipe_on_delete(sender, instance, origin=None, **kwargs):
+    if _cascading_from_recipe(origin) or _cascading_from_comment(instance, origin) or bulk.reindexing():
+        return
+    touch_recipe(instance.recipe_id)
+
+
+def _cascading_from_comment(instance, origin):
+    # Respostas apagadas junto com o comentário de cima
+    return isinstance(origin, Comment) and origin is not instance
+
+
+@receiver(post_save, sender=Comment)
+def place_comment_in_thread(sender, instance, created, **kwargs):
+    if created and not instance.path:
+        threads.assign_path(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def recount_thread_on_delete(sender, instance, origin=None, **kwargs):
+    if _cascading_from_recipe(origin) or _cascading_from_comment(instance, origin):
+        return
+    if instance.parent_id:
+        threads.recount(threads.ancestor_ids(instance.path))
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def sync_follows(sender, instance, action, reverse, pk_set, **kwargs):
+    # `user.following.add(autor)` chega com reverse=False; `autor.followers.add(user)`, com True
+    if action in ('pre_remove', 'pre_clear'):
+        side = {'author_id': instance.pk} if reverse else {'follower_id': instance.pk}
+        instance._removed_follows = follows.existing_pairs(others=pk_set, **side)
+    elif action == 'post_add':
+        pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+        follows.apply(pairs, 1)
+        feed.backfill(pairs)
+    elif action in ('post_remove', 'post_clear'):
+        pairs = instance.__dict__.pop('_removed_follows', [])
+        follows.apply(pairs, -1)
+        feed.forget(pairs)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # Troca de senha, desativação e edição de perfil
+    authentication.forget_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def forget_cached_token(sender, instance, **kwargs):
+    authentication.forget_token(instance.key)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        authentication.forget_user(user.pk)
@@ -0,0 +1,100 @@
+"""
+Ordem dos passos de preparo com chaves esparsas.
+
+`PreparationStep.order` guarda chaves com folga de GAP entre vizinhos, então
+inserir ou mover um passo só escolhe um valor no meio do intervalo e grava uma
+linha. Quando o intervalo acaba, os passos da receita são renumerados em um
+único `bulk_update`, com chaves acima da maior atual para não violar a
+restrição única `(recipe, order)` no meio do UPDATE.
+"""
+from django.db import transaction
+from django.db.models import Max
+
+from api import search
+from api.conditional import touch_recipe
+from api.models import PreparationStep
+
+GAP = 1024
+
+
+def spaced_keys(count, start=0):
+    """`count` chaves com folga GAP, todas maiores que `start`."""
+    return [start + GAP * (index + 1) for index in range(count)]
+
+
+def append_keys(recipe_id, count):
+    """Chaves para acrescentar `count` passos no fim da receita."""
+    last = PreparationStep.objects.filter(recipe_id=recipe_id).aggregate(last=Max('order'))['last']
+    return spaced_keys(count, last or 0)
+
+
+def _place(steps, index, ceiling):
+    """
+    Dá ao passo em `steps[index]` uma chave entre os vizinhos. Sem espaço,
+    renumera a lista inteira acima de `ceiling`. Retorna o novo teto.
+    """
+    previous = steps[index - 1].order if index > 0 else 0
+    following = steps[index + 1].order if index + 1 < len(steps) else None
+
+    if following is None:
+        steps[index].order = previous + GAP
+    elif following - previous > 1:
+        steps[index].order = (previous + following) // 2
+    else:
+        for step, key in zip(steps, spaced_keys(len(steps), ceiling)):
+            step.order = key
+    return max(ceiling, steps[index].order, steps[-1].order)
+
+
+def apply_operations(recipe, operations):
+    """
+    Aplica em sequência operações `{'step': id, 'after': id | None}` (mover)
+    e `{'description': texto, 'after': id | None}` (inserir); `after=None`
+    coloca no início. Levanta ValueError com a mensagem do erro (passo de
+    outra receita ou movido para depois dele mesmo).
+    Retorna os passos na nova ordem.
+    """
+    with transaction.atomic():
+        steps = list(recipe.steps.select_for_update().order_by('order', 'id'))
+        original = {step.pk: step.order for step in steps}
+        ceiling = max(original.values(), default=0)
+        by_id = {step.pk: step for step in steps}
+        created = []
+
+        for operation in operations:
+            after = operation.get('after')
+            if after is not None and after not in by_id:
+                raise ValueError(f'Passo {after} não pertence a esta receita')
+
+            if 'step' in operation:
+                if operation['step'] not in by_id:
+                    raise ValueError(f"Passo {operation['step']} não pertence a esta receita")
+                if operation['step'] == after:
+                    raise ValueError(f'Passo {after} não pode ser movido para depois dele mesmo')
+                step = by_id[operation['step']]
+                steps.remove(step)
+            else:
+                step = PreparationStep(recipe=recipe, description=operation['description'])
+                created.append(step)
+
+            index = steps.index(by_id[after]) + 1 if after is not None else 0
+            steps.insert(index, step)
+            ceiling = _place(steps, index, ceiling)
+
+        changed = [step for step in steps if step.pk and step.order != original[step.pk]]
+        # Uma chave nova igual à antiga de outro passo que também muda pode
+        # colidir no UPDATE linha a linha; nesse caso renumera tudo acima do teto
+        vacated = {original[step.pk] for step in changed}
+        if any(step.order in vacated and step.order != original[step.pk] for step in changed):
+            for step, key in zip(steps, spaced_keys(len(steps), ceiling)):
+                step.order = key
+            changed = [step for step in steps if step.pk]
+
+        PreparationStep.objects.bulk_update(changed, ['order'])
+        PreparationStep.objects.bulk_create(created)
+
+        if created:
+            search.index_recipes([recipe.pk])
+        if changed or created:
+            touch_recipe(recipe.pk)
+    return steps
@@ -0,0 +1,189 @@
+"""
+Sugestões de quem seguir, calculadas fora das requisições.
+
+O comando `build_suggestions` lê o grafo de `User.following` para arrays
+CSR do NumPy: `indptr`/`indices` de quem cada usuário segue, de quem o segue
+e dos autores das receitas que ele favoritou (com repetição, um por
+favorito). Os usuários viram posições 0..n-1 por `np.searchsorted` nos ids
+ordenados.
+
+A pontuação de um usuário soma, com os pesos de WEIGHTS, as vizinhanças
+juntadas de uma vez (`_gather`) e agrupadas com `unique` + `bincount`; o
+custo depende do tamanho da vizinhança, não do total de usuários:
+
+- `two_hop`: quantos dos que ele segue seguem o candidato;
+- `mutual`: quantos dos seguidores dele também seguem o candidato;
+- `follows_you`: o candidato já o segue;
+- `favorite_author`: receitas favoritadas do candidato, se for da mesma UF.
+
+Os top-K de cada usuário vão para UserSuggestion, trocada inteira numa
+transação; a requisição só lê as linhas dela (`for_user`), então todos os
+processos web veem o mesmo resultado e nenhum monta o grafo.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from api.models import Favorite, User, UserSuggestion
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depende do ambiente
+    np = None
+
+DEFAULTS = {
+    'TOP_K': 20,
+    'BATCH_SIZE': 2000,
+}
+
+WEIGHTS = {
+    'two_hop': 1.0,
+    'mutual': 0.5,
+    'follows_you': 3.0,
+    'favorite_author': 2.0,
+}
+
+
+def _setting(name):
+    return getattr(settings, 'SUGGESTIONS', {}).get(name, DEFAULTS[name])
+
+
+def is_available():
+    """O cálculo das sugestões depende do NumPy."""
+    return np is not None
+
+
+def _csr(rows, cols, n):
+    """CSR (indptr, indices) das arestas `rows[i] -> cols[i]` entre posições 0..n-1."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32)
+
+
+def _gather(indptr, indices, rows):
+    """Junta as vizinhanças das `rows` num só array, sem laço em Python."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    if not lengths.sum():
+        return np.empty(0, dtype=indices.dtype)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return indices[offsets + np.arange(lengths.sum())]
+
+
+class FollowGraph:
+    """Retrato do grafo de seguidores e dos autores favoritados, em CSR."""
+
+    def __init__(self, user_ids, states, follows, favorites):
+        self.ids = np.asarray(user_ids, dtype=np.int64)
+        self.n = len(self.ids)
+        self.states = np.asarray(states)
+
+        followers, authors = self.positions(follows[:, 0]), self.positions(follows[:, 1])
+        self.following = _csr(followers, authors, self.n)
+        self.followers = _csr(authors, followers, self.n)
+        self.favorites = _csr(self.positions(favorites[:, 0]), self.positions(favorites[:, 1]), self.n)
+
+    @classmethod
+    def build(cls):
+        users = list(User.objects.filter(is_active=True).order_by('pk').values_list('pk', 'state'))
+        user_ids = [pk for pk, _ in users]
+        states = [state for _, state in users]
+        active = set(user_ids)
+
+        follows = [
+            pair for pair in User.following.through.objects.values_list('from_user_id', 'to_user_id').iterator(chunk_size=10000)
+            if pair[0] in active and pair[1] in active
+        ]
+        favorites = [
+            pair for pair in Favorite.objects.values_list('user_id', 'recipe__author_id').iterator(chunk_size=10000)
+            if pair[0] in active and pair[1] in active and pair[0] != pair[1]
+        ]
+        return cls(
+            user_ids, states,
+            np.array(follows, dtype=np.int64).reshape(-1, 2),
+            np.array(favorites, dtype=np.int64).reshape(-1, 2),
+        )
+
+    def positions(self, user_ids):
+        return np.searchsorted(self.ids, user_ids).astype(np.int64)
+
+    def position(self, user_id):
+        index = int(np.searchsorted(self.ids, user_id))
+        if index < self.n and self.ids[index] == user_id:
+            return index
+        return None
+
+    def scores(self, index):
+        """`(posições, pontuações)` dos candidatos do usuário na posição `index`."""
+        row = np.array([index])
+        followees = _gather(*self.following, row)
+        followers = _gather(*self.followers, row)
+        parts = [
+            (_gather(*self.following, followees), WEIGHTS['two_hop']),
+            (_gather(*self.following, followers), WEIGHTS['mutual']),
+            (followers, WEIGHTS['follows_you']),
+        ]
+        if self.states[index]:
+            authors = _gather(*self.favorites, row)
+            parts.append((authors[self.states[authors] == self.states[index]], WEIGHTS['favorite_author']))
+
+        candidates = np.concatenate([positions for positions, _ in parts])
+        weights = np.concatenate([np.full(len(positions), weight) for positions, weight in parts])
+        keep = (candidates != index) & ~np.isin(candidates, followees)
+        positions, inverse = np.unique(candidates[keep], return_inverse=True)
+        return positions, np.bincount(inverse, weights=weights[keep], minlength=len(positions))
+
+    def top(self, user_id, k):
+        """`[(id, pontuação)]` dos k melhores candidatos, da maior pontuação para a menor."""
+        index = self.position(user_id)
+        if index is None:
+            return []
+        positions, scores = self.scores(index)
+        if len(positions) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            positions, scores = positions[best], scores[best]
+        # Empates pelo id, para a ordem não depender do argpartition
+        order = np.lexsort((self.ids[positions], -scores))
+        return [(int(self.ids[i]), round(float(score), 2)) for i, score in zip(positions[order], scores[order])]
+
+    def active_ids(self):
+        """Ids de quem segue, é seguido ou favoritou alguém (os demais não têm candidatos)."""
+        degree = np.diff(self.following[0]) + np.diff(self.followers[0]) + np.diff(self.favorites[0])
+        return self.ids[degree > 0]
+
+
+def build():
+    """Recalcula e grava o top-K de todos os usuários; retorna quantos têm sugestões."""
+    graph = FollowGraph.build()
+    k = _setting('TOP_K')
+    batch_size = _setting('BATCH_SIZE')
+    users = 0
+    with transaction.atomic():
+        UserSuggestion.objects.all().delete()
+        batch = []
+        for user_id in graph.active_ids().tolist():
+            ranking = graph.top(user_id, k)
+            users += bool(ranking)
+            batch += [
+                UserSuggestion(user_id=user_id, suggested_id=suggested_id, rank=rank, score=score)
+                for rank, (suggested_id, score) in enumerate(ranking, start=1)
+            ]
+            if len(batch) >= batch_size:
+                UserSuggestion.objects.bulk_create(batch)
+                batch = []
+        UserSuggestion.objects.bulk_create(batch)
+    return users
+
+
+def for_user(user):
+    """
+    Sugestões gravadas do usuário, na ordem, já sem quem ele passou a seguir
+    depois do último cálculo; uma consulta com o sugerido junto.
+    """
+    followed = User.following.through.objects.filter(from_user_id=user.pk).values('to_user_id')
+    return (
+        UserSuggestion.objects.filter(user_id=user.pk, suggested__is_active=True)
+        .exclude(suggested_id__in=followed)
+        .select_related('suggested')
+        .order_by('rank')
+    )
@@ -0,0 +1,97 @@
+"""
+Respostas em thread com caminho materializado.
+
+`Comment.path` junta os ids da raiz até o comentário em segmentos de largura
+fixa separados por '/'. O segmento da raiz é invertido (MAX - id) para que a
+ordem crescente do caminho traga as threads mais novas primeiro, e dentro de
+cada thread as respostas na ordem em que foram escritas. Assim uma página de
+threads é um único intervalo do índice `(recipe, path)`.
+
+O caminho é gravado pelo sinal de criação de Comment (`assign_path`), então
+vale para qualquer forma de criar comentários. `reply_count` conta todos os
+descendentes e é ajustado com F() na criação; na exclusão os ancestros são
+recontados pelo intervalo do caminho.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+
+from api.models import Comment
+
+WIDTH = 10
+SEPARATOR = '/'
+# Primeiro caractere depois do separador: fecha o intervalo dos descendentes
+AFTER_SEPARATOR = chr(ord(SEPARATOR) + 1)
+ROOT_MAX = 10 ** WIDTH - 1
+# Cabe em `path` (max_length=255) com folga
+MAX_NESTING = 20
+
+
+def display_depth():
+    """Profundidade a partir da qual as respostas ficam recolhidas."""
+    return getattr(settings, 'COMMENT_THREAD_DEPTH', 3)
+
+
+def segment(comment_id, root=False):
+    return str(ROOT_MAX - comment_id if root else comment_id).zfill(WIDTH)
+
+
+def ancestor_ids(path):
+    """Ids dos ancestros, da raiz ao pai, a partir do caminho."""
+    segments = path.split(SEPARATOR)[:-1]
+    return [ROOT_MAX - int(s) if index == 0 else int(s) for index, s in enumerate(segments)]
+
+
+def descendants_range(path):
+    """`(início, fim)` exclusivo do intervalo de caminhos dos descendentes."""
+    return path + SEPARATOR, path + AFTER_SEPARATOR
+
+
+def assign_path(comment):
+    """Grava caminho e profundidade do comentário recém-criado e conta a resposta nos ancestros."""
+    if comment.parent_id:
+        parent = comment.parent
+        comment.path = parent.path + SEPARATOR + segment(comment.pk)
+        comment.depth = parent.depth + 1
+        Comment.objects.filter(pk__in=ancestor_ids(comment.path)).update(reply_count=F('reply_count') + 1)
+    else:
+        comment.path = segment(comment.pk, root=True)
+        comment.depth = 0
+    Comment.objects.filter(pk=comment.pk).update(path=comment.path, depth=comment.depth)
+
+
+def create_comment(recipe, user, text, parent=None):
+    """Cria o comentário (ou resposta a `parent`); o sinal completa o caminho."""
+    with transaction.atomic():
+        return Comment.objects.create(recipe=recipe, user=user, text=text, parent=parent)
+
+
+def recount(comment_ids):
+    """Recalcula `reply_count` dos comentários com uma subconsulta por intervalo."""
+    descendants = Comment.objects.filter(
+        recipe=OuterRef('recipe'),
+        path__gt=Concat(OuterRef('path'), Value(SEPARATOR)),
+        path__lt=Concat(OuterRef('path'), Value(AFTER_SEPARATOR)),
+    ).order_by().values('recipe').annotate(total=Count('pk')).values('total')
+    return Comment.objects.filter(pk__in=comment_ids).update(
+        reply_count=Coalesce(Subquery(descendants, output_field=IntegerField()), Value(0))
+    )
+
+
+def thread_queryset(recipe_id, root=None, max_depth=None):
+    """
+    Comentários da receita em ordem de thread (filtrar/paginar por `path`).
+    Com `root`, só os descendentes dele. Respostas além de `max_depth` níveis
+    (contados a partir da raiz pedida) ficam de fora: o último nível visível
+    mostra quantas existem em `reply_count`.
+    """
+    queryset = Comment.objects.filter(recipe_id=recipe_id)
+    base_depth = 0
+    if root is not None:
+        start, end = descendants_range(root.path)
+        queryset = queryset.filter(path__gt=start, path__lt=end)
+        base_depth = root.depth + 1
+    if max_depth is not None:
+        queryset = queryset.filter(depth__lte=base_depth + max_depth)
+    return queryset
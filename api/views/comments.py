@@ -9,7 +9,13 @@ from rest_framework.response import Response
 from api.models import Recipe
 from django.shortcuts import get_object_or_404
 from drf_yasg import openapi
-from django.db.models import Avg
+from django.db import transaction
+from api.optimizer import optimize_queryset
+from api import ratings
+from api import cache as recipe_cache
+from api.conditional import recipe_conditional, recipe_version
+from api.pagination import ThreadPagination
+from api import notifications, threads
 
 
 comment_schema = openapi.Schema(
@@ -20,24 +26,71 @@ comment_schema = openapi.Schema(
             type=openapi.TYPE_STRING,
             description='Texto do comentário'
         ),
+        'parent': openapi.Schema(
+            type=openapi.TYPE_INTEGER,
+            description='Comentário respondido (opcional)'
+        ),
     },
 )
 
 
+@swagger_auto_schema(
+    method='get',
+    operation_description="Lista os comentários de uma receita em ordem de thread (threads mais novas primeiro, "
+                          "respostas logo abaixo de quem responderam), paginados por cursor. Respostas mais profundas que "
+                          "'depth' ficam recolhidas: o último nível mostra o total em reply_count e 'thread' expande um comentário.",
+    manual_parameters=[
+        openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor opaco retornado em next/previous", type=openapi.TYPE_STRING),
+        openapi.Parameter('page_size', openapi.IN_QUERY, description="Quantidade de comentários por página", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('thread', openapi.IN_QUERY, description="Lista só as respostas deste comentário", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('depth', openapi.IN_QUERY, description="Níveis de resposta exibidos (padrão e máximo em COMMENT_THREAD_DEPTH)", type=openapi.TYPE_INTEGER),
+    ],
+    responses={
+        200: openapi.Response('Comentários da receita', CommentSerializer(many=True)),
+        400: 'Parâmetros inválidos',
+        404: 'Receita ou comentário não encontrado'
+    }
+)
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@recipe_conditional()
 def get_list_comments_byId(request, id):
-    try:
-        recipe = Recipe.objects.get(pk=id)
-    except Recipe.DoesNotExist:
+    # A versão da receita já foi lida (e cacheada) pela checagem condicional
+    if recipe_version(id) is None:
         return Response(
             {'error': 'Receita não encontrada'},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    comments = recipe.comments.all()  
-    serializer = CommentSerializer(comments, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    try:
+        depth = int(request.query_params.get('depth', threads.display_depth()))
+        depth = max(0, min(depth, threads.display_depth()))
+        thread_id = request.query_params.get('thread')
+        thread_id = int(thread_id) if thread_id else None
+    except ValueError:
+        return Response({'error': 'Os parâmetros "depth" e "thread" devem ser inteiros'}, status=status.HTTP_400_BAD_REQUEST)
+
+    root = None
+    if thread_id is not None:
+        root = Comment.objects.filter(pk=thread_id, recipe_id=id).only('path', 'depth', 'user_id').first()
+        if root is None:
+            return Response({'error': 'Comentário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    comments = optimize_queryset(threads.thread_queryset(id, root=root, max_depth=depth), CommentSerializer)
+    paginator = ThreadPagination()
+
+    def build():
+        page = paginator.paginate_queryset(comments, request)
+        return dict(paginator.get_paginated_response(CommentSerializer(page, many=True).data).data)
+
+    if request.query_params.get(paginator.cursor_query_param) or root is not None:
+        return Response(build(), status=status.HTTP_200_OK)
+
+    # A primeira página fica em cache até o próximo comentário criado ou
+    # apagado (os sinais de Comment avançam a versão da receita)
+    page_size = paginator.get_page_size(request)
+    data = recipe_cache.get_or_build(id, f'comments:{page_size}:{depth}', build)
+    return Response(data, status=status.HTTP_200_OK)
 
 
 @swagger_auto_schema(
@@ -61,10 +114,30 @@ def create_comment_byId(request, id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+    parent = None
+    if request.data.get('parent') is not None:
+        try:
+            parent_id = int(request.data['parent'])
+        except (TypeError, ValueError):
+            return Response({'error': 'O campo "parent" deve ser um id de comentário'}, status=status.HTTP_400_BAD_REQUEST)
+        parent = Comment.objects.filter(pk=parent_id, recipe=target_recipe).only('path', 'depth', 'user_id').first()
+        if parent is None:
+            return Response({'error': 'Comentário respondido não encontrado nesta receita'}, status=status.HTTP_400_BAD_REQUEST)
+        if parent.depth + 1 >= threads.MAX_NESTING:
+            return Response({'error': 'Limite de respostas aninhadas atingido'}, status=status.HTTP_400_BAD_REQUEST)
+
     serializer = CommentSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(user=request.user, recipe=target_recipe)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        comment = threads.create_comment(target_recipe, request.user, serializer.validated_data['text'], parent=parent)
+        recipients = {target_recipe.author_id}
+        if parent is not None:
+            recipients.add(parent.user_id)
+        for user_id in recipients:
+            notifications.notify(
+                user_id, notifications.Type.COMMENT, request.user,
+                recipe_id=target_recipe.pk, comment_id=comment.pk,
+            )
+        return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -74,7 +147,7 @@ def create_comment_byId(request, id):
 def delete_comment_byId(request, id):
     try: 
         target_comment = Comment.objects.get(pk=id)
-        if target_comment.user != request.user:
+        if target_comment.user_id != request.user.pk:
             return Response(
                 {"detail": "Você não tem permissão para deletar este comentário."},
                 status=status.HTTP_403_FORBIDDEN
@@ -142,11 +215,23 @@ def rating_recipe_byId(request, id):
         return Response({'error': 'A avaliação deve estar entre 1 e 5'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-    rating_obj, created = Rating.objects.update_or_create(
-        user=request.user,
-        recipe=recipe,
-        defaults={'rating': rating_value}
-    )
+    with transaction.atomic():
+        # Trava a receita, não a avaliação: na primeira nota a linha ainda não
+        # existe e duas requisições simultâneas leriam `previous=None`
+        Recipe.objects.select_for_update().filter(pk=recipe.pk).values_list('pk', flat=True).first()
+        previous = Rating.objects.filter(
+            user=request.user, recipe=recipe
+        ).values_list('rating', flat=True).first()
+        rating_obj, created = Rating.objects.update_or_create(
+            user=request.user,
+            recipe=recipe,
+            defaults={'rating': rating_value}
+        )
+        ratings.apply_rating_change(recipe.pk, previous, rating_value)
+        if created:
+            notifications.notify(recipe.author_id, notifications.Type.RATING, request.user, recipe_id=recipe.pk, rating=rating_value)
+    # A média e o total aparecem no detalhe da receita
+    recipe_cache.invalidate_recipe(recipe.pk)
 
     serializer = RatingSerializer(rating_obj)
 
@@ -166,14 +251,11 @@ def get_rating_recipe_byId(request, id):
             status=status.HTTP_404_NOT_FOUND
         )
 
-    ratings = target_recipe.ratings.all()
-    serializer = RatingSerializer(ratings, many=True)
-
-    total_ratings = ratings.count()
-    average_rating = ratings.aggregate(Avg('rating'))['rating__avg'] or 0
+    serializer = RatingSerializer(target_recipe.ratings.all(), many=True)
 
     return Response({
         'ratings': serializer.data,
-        'total_ratings': total_ratings,
-        'average_rating': round(average_rating, 2)
+        'total_ratings': target_recipe.rating_count,
+        'average_rating': target_recipe.avg_rating,
+        'histogram': target_recipe.rating_histogram
     }, status=status.HTTP_200_OK)
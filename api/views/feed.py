@@ -0,0 +1,34 @@
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+
+from api import feed
+from api.models import Recipe
+from api.optimizer import optimize_queryset
+from api.pagination import FeedPagination
+from api.serializers import RecipeSerializer
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Feed com as receitas de quem o usuário segue, das mais novas para as mais antigas, "
+                          "paginado por cursor. Só leitura; o comando `trim_timelines` limita o tamanho das timelines.",
+    manual_parameters=[
+        openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor devolvido em `next`/`previous`", type=openapi.TYPE_STRING),
+        openapi.Parameter('page_size', openapi.IN_QUERY, description="Itens por página (máximo 100)", type=openapi.TYPE_INTEGER),
+    ],
+    responses={
+        200: openapi.Response('Página do feed', schema=RecipeSerializer(many=True)),
+        404: 'Cursor inválido'
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_feed(request):
+    paginator = FeedPagination()
+    page = paginator.paginate_querysets(feed.sources(request.user), request)
+    ids = [item.recipe_id for item in page]
+    recipes = optimize_queryset(Recipe.objects.all(), RecipeSerializer).in_bulk(ids)
+    serializer = RecipeSerializer([recipes[recipe_id] for recipe_id in ids if recipe_id in recipes], many=True)
+    return paginator.get_paginated_response(serializer.data)
@@ -1,4 +1,4 @@
-from api.serializers import IngredientSerializer, PreparationStepSerializer
+from api.serializers import IngredientSerializer, IngredientUpsertSerializer, PreparationStepSerializer
 from api.models import Ingredient
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -7,6 +7,8 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from api.models import Recipe
 from django.shortcuts import get_object_or_404
+from api import bulk
+from api import cache as recipe_cache
 
 ingredient_schema = openapi.Schema(
     type=openapi.TYPE_OBJECT,
@@ -38,17 +40,51 @@ ingredient_schema = openapi.Schema(
         404: 'Receita não encontrada'
     }
 )
-@api_view(['POST'])
+@swagger_auto_schema(
+    methods=['put', 'patch'],
+    operation_description="Edita os ingredientes da receita de uma vez: itens com 'id' são atualizados, sem 'id' são criados. "
+                          "No PUT a lista é o estado final e os ingredientes que ficarem de fora são apagados; no PATCH eles são mantidos.",
+    request_body=IngredientUpsertSerializer(many=True),
+    responses={
+        200: openapi.Response('Ingredientes atualizados com sucesso', IngredientSerializer(many=True)),
+        400: 'Dados inválidos',
+        404: 'Receita não encontrada'
+    }
+)
+@api_view(['POST', 'PUT', 'PATCH'])
 @permission_classes([permissions.IsAuthenticated])
 def create_ingredient(request, id_recipe):
     recipe = get_object_or_404(Recipe, id=id_recipe, author=request.user)
+    if request.method in ('PUT', 'PATCH'):
+        return replace_ingredients(request, recipe)
+
     serializer = IngredientSerializer(data=request.data)
     if serializer.is_valid():
         serializer.save(recipe=recipe) 
+        recipe_cache.invalidate_recipe(recipe.pk)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def replace_ingredients(request, recipe):
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'error': 'Envie uma lista de ingredientes'}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = IngredientUpsertSerializer(data=items, many=True)
+    if not serializer.is_valid():
+        return Response({'errors': bulk.item_errors(serializer.errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Os ids precisam ser de ingredientes desta receita e não podem repetir
+    try:
+        bulk.apply_ingredient_diff(recipe, serializer.validated_data, replace=request.method == 'PUT')
+    except ValueError as e:
+        return Response({'errors': e.args[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+    ingredients = Ingredient.objects.filter(recipe=recipe).order_by('id')
+    return Response(IngredientSerializer(ingredients, many=True).data, status=status.HTTP_200_OK)
+
+
 @swagger_auto_schema(
     method='delete',
     operation_description="Deleta um ingrediente do usuário logado pelo id",
@@ -61,10 +97,11 @@ def create_ingredient(request, id_recipe):
 @permission_classes([permissions.IsAuthenticated])
 def delete_ingredient(request, id):
     try:
-        target_ingredient = Ingredient.objects.get(id=id)
-        if(target_ingredient.recipe.author != request.user):
+        target_ingredient = Ingredient.objects.select_related('recipe').get(id=id)
+        if(target_ingredient.recipe.author_id != request.user.pk):
             return Response(status=status.HTTP_403_FORBIDDEN)
         target_ingredient.delete()
+        recipe_cache.invalidate_recipe(target_ingredient.recipe_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
     except Ingredient.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
@@ -0,0 +1,110 @@
+from django.utils.dateparse import parse_datetime
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from api import notifications
+from api.models import Notification
+from api.pagination import NotificationPagination
+from api.serializers import NotificationSerializer
+
+READ_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Lista as notificações do usuário logado, das atualizadas por último para as mais antigas "
+                          "(um evento agrupado traz a notificação de volta ao topo), paginadas por cursor. "
+                          "Com `read=false` só as não lidas (e `read=true` só as lidas).",
+    manual_parameters=[
+        openapi.Parameter('read', openapi.IN_QUERY, description="Filtra por lida (true/false)", type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor devolvido em `next`/`previous`", type=openapi.TYPE_STRING),
+        openapi.Parameter('page_size', openapi.IN_QUERY, description="Itens por página (máximo 100)", type=openapi.TYPE_INTEGER),
+    ],
+    responses={
+        200: openapi.Response('Notificações', schema=NotificationSerializer(many=True)),
+        400: 'Filtro inválido',
+        404: 'Cursor inválido'
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def list_notifications(request):
+    queryset = Notification.objects.filter(user=request.user)
+
+    read = request.query_params.get('read')
+    if read is not None:
+        if read.lower() not in READ_VALUES:
+            return Response({'error': 'O parâmetro "read" deve ser true ou false'}, status=status.HTTP_400_BAD_REQUEST)
+        # `read IN (?)` em vez de `read`/`NOT read`: o SQLite só usa o índice
+        # (user, read, updated_at) com a coluna comparada a um valor
+        queryset = queryset.filter(read__in=[READ_VALUES[read.lower()]])
+
+    paginator = NotificationPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = NotificationSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Total de notificações não lidas do usuário logado (badge). Servido do cache.",
+    responses={
+        200: openapi.Response('Total de não lidas', schema=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={'unread': openapi.Schema(type=openapi.TYPE_INTEGER)}
+        )),
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def unread_notifications_count(request):
+    return Response({'unread': notifications.unread_count(request.user.pk)}, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="Marca como lidas todas as notificações do usuário logado ou, com `up_to`, só as que vêm até ela "
+                          "na ordem da lista (a mais nova que o app já mostrou). Envie também o `updated_at` que o app "
+                          "mostrou dessa notificação em `seen_at`: eventos agrupados nela depois disso continuam não lidos.",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'up_to': openapi.Schema(type=openapi.TYPE_INTEGER, description='Id da notificação mais nova a marcar (opcional)'),
+            'seen_at': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                                      description='`updated_at` dessa notificação como o app mostrou (opcional)'),
+        },
+    ),
+    responses={
+        200: openapi.Response('Notificações marcadas', schema=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={'marked': openapi.Schema(type=openapi.TYPE_INTEGER)}
+        )),
+        400: 'Dados inválidos'
+    }
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_notifications_read(request):
+    up_to = request.data.get('up_to')
+    if up_to is not None:
+        try:
+            up_to = int(up_to)
+        except (TypeError, ValueError):
+            return Response({'error': 'O campo "up_to" deve ser um id de notificação'}, status=status.HTTP_400_BAD_REQUEST)
+
+    seen_at = request.data.get('seen_at')
+    if seen_at is not None:
+        try:
+            seen_at = parse_datetime(seen_at) if isinstance(seen_at, str) else None
+        except ValueError:
+            # Bem formada, mas impossível (ex.: 30 de fevereiro)
+            seen_at = None
+        if seen_at is None or up_to is None:
+            return Response({'error': 'O campo "seen_at" deve ser uma data ISO 8601, junto com "up_to"'}, status=status.HTTP_400_BAD_REQUEST)
+
+    marked = notifications.mark_read(request.user.pk, up_to=up_to, seen_at=seen_at)
+    return Response({'marked': marked}, status=status.HTTP_200_OK)
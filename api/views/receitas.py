@@ -5,15 +5,76 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from api.serializers import RecipeSerializer, IngredientSerializer, PreparationStepSerializer
+from api.serializers import RecipeSerializer, IngredientSerializer, PreparationStepSerializer, RecipeBulkSerializer, StepOperationSerializer, SimilarRecipeSerializer
 
 from rest_framework import generics, permissions, status
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from api.models import Recipe, PreparationStep, Ingredient, Favorite
+from api.models import Recipe, PreparationStep, Ingredient, Favorite, RecipeSimilarity
+from api.pagination import KeysetPagination, SearchRankPagination
+from api import bulk, catalog, facets, ingredient_index, notifications, search, steps
+from api.conditional import recipe_conditional, touch_recipe
+from api.optimizer import optimize_queryset
+from api import cache as recipe_cache
 
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.db.models import Max, Min
+import random
+
+# Filtros compartilhados pela busca e pela receita aleatória
+recipe_filter_parameters = [
+    openapi.Parameter('difficulty', openapi.IN_QUERY, description="Filtrar por dificuldade", type=openapi.TYPE_STRING),
+    openapi.Parameter('prep_time', openapi.IN_QUERY, description="Filtrar por tempo de preparo máximo (em minutos)", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('state', openapi.IN_QUERY, description="Estado da receita", type=openapi.TYPE_STRING),
+]
+
+
+def filter_recipes(queryset, params):
+    for condition in facets.filters(params).values():
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def sample_recipe_ids(queryset, total, rounds=4):
+    """
+    Sorteia até `total` ids distintos do queryset sem ORDER BY RANDOM().
+
+    A cada rodada sorteia ids ainda não tentados em [min_id, max_id] do
+    próprio queryset e busca todos de uma vez pela chave primária; só os
+    sorteados que existem (e passam nos filtros) valem, o resto é descartado,
+    então toda receita tem a mesma chance, com ou sem buracos entre os ids.
+    Se as rodadas acabam antes de `total`, completa com ORDER BY RANDOM()
+    só sobre o queryset filtrado.
+    """
+    bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    low, high = bounds['low'], bounds['high']
+    span = high - low + 1
+
+    ids = queryset.values_list('id', flat=True)
+    found, probed = [], set()
+    for _ in range(rounds):
+        wanted = min(2 * (total - len(found)), span - len(probed))
+        if wanted <= 0:
+            break
+        draws = []
+        while len(draws) < wanted:
+            pivot = random.randint(low, high)
+            if pivot not in probed:
+                probed.add(pivot)
+                draws.append(pivot)
+        hits = set(ids.filter(id__in=draws))
+        found += [pivot for pivot in draws if pivot in hits][:total - len(found)]
+        if len(found) == total:
+            return found
+
+    if len(probed) < span:
+        found += list(ids.exclude(id__in=found).order_by('?')[:total - len(found)])
+    return found
+
 
 @swagger_auto_schema(
     method='post',
@@ -39,6 +100,46 @@ def create_recipe(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+BULK_MAX_RECIPES = 1000
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="Cria várias receitas do usuário logado, com ingredientes e passos, em uma única transação. "
+                          "Se algum item for inválido nada é gravado e os erros vêm por índice.",
+    request_body=RecipeBulkSerializer(many=True),
+    responses={
+        201: openapi.Response('Receitas criadas com sucesso', schema=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'created': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+            }
+        )),
+        400: 'Dados inválidos'
+    }
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def create_recipes_bulk(request):
+    items = request.data
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Envie uma lista não vazia de receitas'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > BULK_MAX_RECIPES:
+        return Response(
+            {'error': f'No máximo {BULK_MAX_RECIPES} receitas por requisição'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Valida tudo antes de gravar qualquer coisa
+    serializer = RecipeBulkSerializer(data=items, many=True)
+    if not serializer.is_valid():
+        return Response({'errors': bulk.item_errors(serializer.errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+    ids = bulk.create_recipes(request.user, serializer.validated_data)
+    return Response({'created': len(ids), 'ids': ids}, status=status.HTTP_201_CREATED)
+
+
 @swagger_auto_schema(
     method='get',
     operation_description="Busca uma receita pelo ID para o usuário logado",
@@ -49,83 +150,184 @@ def create_recipe(request):
 )
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@recipe_conditional()
 def search_recipe_byId(request, id):
+    def build():
+        target_recipe = optimize_queryset(Recipe.objects.all(), RecipeSerializer).get(pk=id)
+        return dict(RecipeSerializer(target_recipe).data)
+
     try:
-        # Busca a receita pelo ID
+        # Busca a receita pelo ID (resposta serializada fica em cache)
         print("id", id)
-        target_recipe = Recipe.objects.get(pk=id)
+        data = recipe_cache.get_or_build(id, 'detail', build)
     except Recipe.DoesNotExist:
         return Response(
             {'error': 'Receita não encontrada'},
             status=status.HTTP_404_NOT_FOUND
         )
 
-    # Serializa o objeto antes de retornar
-    serializer = RecipeSerializer(target_recipe)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(data, status=status.HTTP_200_OK)
 
 
 @swagger_auto_schema(
     method='get',
     operation_description="Busca receitas com filtros opcionais",
     manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, description="Busca textual em título, ingredientes e passos (ordenada por relevância)", type=openapi.TYPE_STRING),
         openapi.Parameter('title', openapi.IN_QUERY, description="Filtrar por título", type=openapi.TYPE_STRING),
-        openapi.Parameter('difficulty', openapi.IN_QUERY, description="Filtrar por dificuldade", type=openapi.TYPE_STRING),
-        openapi.Parameter('prep_time', openapi.IN_QUERY, description="Filtrar por tempo de preparo máximo (em minutos)", type=openapi.TYPE_INTEGER),
-        openapi.Parameter('state', openapi.IN_QUERY, description="Estado da receita", type=openapi.TYPE_STRING),
+        *recipe_filter_parameters,
+        openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor opaco retornado em next/previous", type=openapi.TYPE_STRING),
+        openapi.Parameter('page_size', openapi.IN_QUERY, description="Quantidade de receitas por página", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('facets', openapi.IN_QUERY, description="Contagens por faceta para os filtros atuais: 'true' para todas ou lista de difficulty,state,prep_time", type=openapi.TYPE_STRING),
     ],
     responses={
         200: openapi.Response('Receitas encontradas com sucesso', schema=RecipeSerializer(many=True)),
+        400: 'Faceta ou filtro inválido',
         404: 'Nenhuma receita encontrada'
     }
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def search_recipe(request):
-    queryset = Recipe.objects.all() 
+    queryset = optimize_queryset(Recipe.objects.all(), RecipeSerializer)
 
+    q = request.query_params.get('q')
     title = request.query_params.get('title')
-    difficulty = request.query_params.get('difficulty')
-    prep_time = request.query_params.get('prep_time')
-    state = request.query_params.get('state')  # corrigido
-
-    if title:
-        queryset = queryset.filter(title__icontains=title)
-    if difficulty:
-        queryset = queryset.filter(difficulty=difficulty)
-    if prep_time:
-        queryset = queryset.filter(prep_time__lte=prep_time)
-    if state:
-        queryset = queryset.filter(state__iexact=state)  # corrigido
-
-    if not queryset.exists():
+
+    facet_names = ()
+    if request.query_params.get('facets'):
+        try:
+            facet_names = facets.parse(request.query_params['facets'])
+        except ValueError as e:
+            return Response({'error': f'Faceta inválida: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if q or title:
+        queryset = search.filter_recipes(queryset, q=q, title=title)
+    # As facetas aplicam os filtros estruturados uma a uma, sobre a busca textual
+    searched = queryset
+    try:
+        queryset = filter_recipes(queryset, request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Com `q` a ordem é a relevância; nos demais casos, as mais recentes primeiro
+    paginator = SearchRankPagination() if q and search.is_available() else KeysetPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    if not page and paginator.position is None:
         return Response({'error': 'Nenhuma receita encontrada'}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = RecipeSerializer(queryset, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer = RecipeSerializer(page, many=True)
+    response = paginator.get_paginated_response(serializer.data)
+    if facet_names:
+        response.data['facets'] = facets.cached_count(searched, facet_names, request.query_params)
+    return response
+
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Busca receitas que dá para fazer com os ingredientes informados, ordenadas pela cobertura",
+    manual_parameters=[
+        openapi.Parameter('ingredients', openapi.IN_QUERY, description="Ingredientes disponíveis separados por vírgula", type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('limit', openapi.IN_QUERY, description="Quantidade máxima de receitas (padrão 20, máximo 100)", type=openapi.TYPE_INTEGER),
+    ],
+    responses={
+        200: openapi.Response('Receitas encontradas com sucesso', schema=RecipeSerializer(many=True)),
+        400: 'Nenhum ingrediente informado',
+        404: 'Nenhuma receita encontrada'
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_recipe_by_ingredients(request):
+    names = [name for name in request.query_params.get('ingredients', '').split(',') if name.strip()]
+    if not names:
+        return Response({'error': 'Informe ao menos um ingrediente'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = min(int(request.query_params.get('limit', 20)), 100)
+    except ValueError:
+        return Response({'error': 'O parâmetro "limit" deve ser um número inteiro'}, status=status.HTTP_400_BAD_REQUEST)
+
+    ranking = ingredient_index.search(names, limit=limit)
+    recipes = optimize_queryset(Recipe.objects.all(), RecipeSerializer).in_bulk([recipe_id for recipe_id, _, _ in ranking])
+    ranking = [entry for entry in ranking if entry[0] in recipes]
+    if not ranking:
+        return Response({'error': 'Nenhuma receita encontrada'}, status=status.HTTP_404_NOT_FOUND)
+
+    serializer = RecipeSerializer([recipes[recipe_id] for recipe_id, _, _ in ranking], many=True)
+    results = [
+        {**data, 'coverage': round(matched / total, 4), 'matched_ingredients': matched, 'total_ingredients': total}
+        for data, (_, matched, total) in zip(serializer.data, ranking)
+    ]
+    return Response(results, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Receitas parecidas (quem gostou desta também gostou de...), da mais parecida para a menos. "
+                          "Calculadas periodicamente pelo comando `build_recommendations`.",
+    manual_parameters=[
+        openapi.Parameter('limit', openapi.IN_QUERY, description="Quantidade máxima de receitas (padrão 10, máximo 50)", type=openapi.TYPE_INTEGER),
+    ],
+    responses={
+        200: openapi.Response('Receitas parecidas', schema=SimilarRecipeSerializer(many=True)),
+        400: 'Parâmetro inválido',
+        404: 'Receita não encontrada'
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def similar_recipes(request, id):
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), 50)
+    except ValueError:
+        return Response({'error': 'O parâmetro "limit" deve ser um número inteiro'}, status=status.HTTP_400_BAD_REQUEST)
 
+    rows = list(RecipeSimilarity.objects.filter(recipe_id=id).select_related('similar').order_by('rank')[:max(limit, 0)])
+    if not rows and not Recipe.objects.filter(pk=id).exists():
+        return Response({'error': 'Receita não encontrada'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(SimilarRecipeSerializer(rows, many=True).data, status=status.HTTP_200_OK)
 
 
 @swagger_auto_schema(
     method='get',
-    operation_description="Busca uma receita de forma aleatória",
+    operation_description="Busca uma receita de forma aleatória. Com `n`, retorna uma lista de até n receitas distintas.",
+    manual_parameters=[
+        *recipe_filter_parameters,
+        openapi.Parameter('n', openapi.IN_QUERY, description="Quantidade de receitas distintas (máximo 20)", type=openapi.TYPE_INTEGER),
+    ],
     responses={
         200: openapi.Response('Receita encontrada com sucesso', schema=RecipeSerializer()),
+        400: 'Parâmetro "n" ou filtro inválido',
         404: 'Nenhuma receita encontrada'
     }
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def random_recipe(request):
-    queryset = Recipe.objects.all() 
+    total = request.query_params.get('n')
+    try:
+        count = 1 if total is None else int(total)
+    except ValueError:
+        count = 0
+    if not 1 <= count <= 20:
+        return Response({'error': 'O parâmetro "n" deve estar entre 1 e 20'}, status=status.HTTP_400_BAD_REQUEST)
 
-    if not queryset.exists():
+    try:
+        queryset = filter_recipes(Recipe.objects.all(), request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    ids = sample_recipe_ids(queryset, count)
+    recipes = optimize_queryset(Recipe.objects.all(), RecipeSerializer).in_bulk(ids)
+    ids = [recipe_id for recipe_id in ids if recipe_id in recipes]
+    if not ids:
         return Response({'error': 'Nenhuma receita encontrada'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Seleciona 1 receita aleatória
-    recipe = queryset.order_by("?").first()
-
-    serializer = RecipeSerializer(recipe)
+    if total is None:
+        serializer = RecipeSerializer(recipes[ids[0]])
+    else:
+        serializer = RecipeSerializer([recipes[recipe_id] for recipe_id in ids], many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -148,6 +350,7 @@ def delete_recipe(request, id):
                     status=status.HTTP_403_FORBIDDEN
                 )
         target_recipe.delete()
+        recipe_cache.invalidate_recipe(id)
         return Response(
             {"detail": "Receita deletada com sucesso."},
             status=status.HTTP_204_NO_CONTENT
@@ -199,6 +402,7 @@ def patch_recipe(request, id):
         serializer = RecipeSerializer(target_recipe, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            recipe_cache.invalidate_recipe(target_recipe.pk)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -234,6 +438,7 @@ def patch_recipe(request, id):
 )
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@recipe_conditional()
 def get_ingredients_by_recipe_id(request, id):
     try:
         recipe = Recipe.objects.filter(id=id).first()
@@ -266,7 +471,7 @@ def get_ingredients_by_recipe_id(request, id):
                 items=openapi.Items(
                     type=openapi.TYPE_OBJECT,
                     properties={
-                        'order': openapi.Schema(type=openapi.TYPE_INTEGER, description='Ordem do passo'),
+                        'order': openapi.Schema(type=openapi.TYPE_INTEGER, description='Ordem entre os passos enviados (são acrescentados ao fim)'),
                         'description': openapi.Schema(type=openapi.TYPE_STRING, description='Descrição do passo')
                     }
                 )
@@ -299,9 +504,63 @@ def create_steps(request, id):
         many=True
     )
     serializer.is_valid(raise_exception=True)
-    serializer.save()
 
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+    # `order` só define a sequência entre os novos; as chaves gravadas são
+    # esparsas e ficam depois do último passo existente
+    validated = sorted(serializer.validated_data, key=lambda step: step['order'])
+    created = PreparationStep.objects.bulk_create([
+        PreparationStep(recipe=recipe, order=key, description=step['description'])
+        for step, key in zip(validated, steps.append_keys(recipe.pk, len(validated)))
+    ])
+    search.index_recipes([recipe.pk])
+    touch_recipe(recipe.pk)
+
+    return Response(PreparationStepSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Exporta o catálogo inteiro em NDJSON (uma receita por linha, com ingredientes, passos e mídias). "
+                          "A resposta é enviada em streaming. Restrito a administradores.",
+    responses={200: 'Arquivo NDJSON', 403: 'Usuário não é administrador'}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def export_recipes(request):
+    response = StreamingHttpResponse(catalog.export_lines(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="receitas.ndjson"'
+    return response
+
+
+@swagger_auto_schema(
+    method='post',
+    operation_description="Move ou insere passos de uma receita do usuário logado. As operações são aplicadas em ordem: "
+                          "{'step': id, 'after': id} move um passo e {'description': texto, 'after': id} insere um novo; "
+                          "'after' nulo coloca no início.",
+    request_body=StepOperationSerializer(many=True),
+    responses={
+        200: openapi.Response('Passos na nova ordem', PreparationStepSerializer(many=True)),
+        400: 'Dados inválidos',
+        404: 'Receita não encontrada'
+    }
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def reorder_steps(request, id):
+    recipe = get_object_or_404(Recipe, id=id, author=request.user)
+
+    if not isinstance(request.data, list) or not request.data:
+        return Response({'error': 'Envie uma lista não vazia de operações'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = StepOperationSerializer(data=request.data, many=True)
+    if not serializer.is_valid():
+        return Response({'errors': bulk.item_errors(serializer.errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        ordered = steps.apply_operations(recipe, serializer.validated_data)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(PreparationStepSerializer(ordered, many=True).data, status=status.HTTP_200_OK)
 
 
 @swagger_auto_schema(
@@ -316,9 +575,10 @@ def create_steps(request, id):
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def delete_step(request, id_recipe, id_step):
-    recipe = get_object_or_404(Recipe, id=id_recipe, user=request.user)
+    recipe = get_object_or_404(Recipe, id=id_recipe, author=request.user)
     step = get_object_or_404(PreparationStep, id=id_step, recipe=recipe)
     step.delete()
+    recipe_cache.invalidate_recipe(recipe.pk)
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -354,6 +614,7 @@ def favorite_recipe_byId(request, id):
                 {"detail": "Receita já está na lista de favoritas."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        notifications.notify(recipe.author_id, notifications.Type.FAVORITE, user, recipe_id=recipe.pk)
         return Response(status=status.HTTP_201_CREATED)
     except Exception as e:
         return Response(
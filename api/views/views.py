@@ -3,9 +3,11 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
-from api.serializers import UserRegisterSerializer, UserLoginSerializer, UserSerializer, UserSerializerEdit
+from api.serializers import UserRegisterSerializer, UserLoginSerializer, UserSerializer, UserSerializerEdit, UserSummarySerializer
+from api.pagination import FollowPagination
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from api import notifications, suggestions
 
 
 User = get_user_model()
@@ -182,7 +184,9 @@ def follow_user(request, id):
     if target_user == request.user:
         return Response({'error': 'Você não pode seguir a si mesmo'}, status=status.HTTP_400_BAD_REQUEST)
 
-    request.user.following.add(target_user)
+    if not request.user.following.filter(pk=target_user.pk).exists():
+        request.user.following.add(target_user)
+        notifications.notify(target_user.pk, notifications.Type.FOLLOWER, request.user)
     return Response({'status': f'Você está seguindo {target_user.username}'}, status=status.HTTP_200_OK)
 
 #---------------------------------------------------------------------------------------
@@ -195,4 +199,80 @@ def unfollow_user(request, id):
         return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
     request.user.following.remove(target_user)
-    return Response({'status': f'Você deixou de seguir {target_user.username}'}, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response({'status': f'Você deixou de seguir {target_user.username}'}, status=status.HTTP_200_OK)
+
+
+def _follow_page(request, id, filter_field, user_field):
+    if not User.objects.filter(pk=id).exists():
+        return Response({'error': 'Usuário não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    rows = User.following.through.objects.filter(**{filter_field: id}).select_related(user_field)
+    paginator = FollowPagination()
+    page = paginator.paginate_queryset(rows, request)
+    serializer = UserSummarySerializer([getattr(row, user_field) for row in page], many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+follow_list_parameters = [
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor devolvido em `next`/`previous`", type=openapi.TYPE_STRING),
+    openapi.Parameter('page_size', openapi.IN_QUERY, description="Itens por página (máximo 100)", type=openapi.TYPE_INTEGER),
+]
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Lista quem segue o usuário, dos mais recentes para os mais antigos, paginado por cursor",
+    manual_parameters=follow_list_parameters,
+    responses={
+        200: openapi.Response('Seguidores', schema=UserSummarySerializer(many=True)),
+        404: 'Usuário não encontrado'
+    }
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def list_followers(request, id):
+    return _follow_page(request, id, 'to_user_id', 'from_user')
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Lista quem o usuário segue, dos mais recentes para os mais antigos, paginado por cursor",
+    manual_parameters=follow_list_parameters,
+    responses={
+        200: openapi.Response('Seguindo', schema=UserSummarySerializer(many=True)),
+        404: 'Usuário não encontrado'
+    }
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def list_following(request, id):
+    return _follow_page(request, id, 'from_user_id', 'to_user')
+
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Sugestões de quem seguir para o usuário logado: quem é seguido por quem você segue, "
+                          "quem já segue você e autores da sua UF cujas receitas você favoritou. "
+                          "Recalculadas periodicamente pelo comando `build_suggestions`.",
+    responses={
+        200: openapi.Response('Sugestões, da maior pontuação para a menor', schema=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+                'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'username': openapi.Schema(type=openapi.TYPE_STRING),
+                'avatar_url': openapi.Schema(type=openapi.TYPE_STRING),
+                'followers_count': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'following_count': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'score': openapi.Schema(type=openapi.TYPE_NUMBER),
+            })
+        )),
+    }
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def suggested_users(request):
+    results = [
+        {**UserSummarySerializer(row.suggested).data, 'score': row.score}
+        for row in suggestions.for_user(request.user)
+    ]
+    return Response(results, status=status.HTTP_200_OK)
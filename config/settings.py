@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'api',
     'rest_framework.authtoken',
+    'rest_framework_simplejwt.token_blacklist',
     'drf_yasg',
     'django_seed',
     "corsheaders",
@@ -93,6 +94,60 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sabor',
+    }
+}
+
+# Cache das respostas de receita (api/cache.py)
+RECIPE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,       # segundos
+    'LOCK_TIMEOUT': 10,   # validade da trava de reconstrução
+    'LOCK_WAIT': 2.0,     # quanto um leitor espera outra reconstrução terminar
+    'FACETS_TIMEOUT': 60, # contagens de facetas podem atrasar até esse tempo
+}
+
+
+# Respostas além desta profundidade vêm recolhidas na listagem de comentários
+COMMENT_THREAD_DEPTH = 3
+
+
+# Feed de quem o usuário segue (api/feed.py)
+FEED = {
+    'FANOUT_LIMIT': 5000,     # acima disso as receitas do autor são lidas na hora, sem cópia
+    'TIMELINE_LENGTH': 800,   # entradas guardadas por timeline
+    'FOLLOW_BACKFILL': 20,    # receitas trazidas ao seguir alguém
+    'BATCH_SIZE': 1000,
+}
+
+
+# Fila de notificações (api/notifications.py)
+NOTIFICATIONS = {
+    'ASYNC': True,           # falso: grava no commit da requisição, sem worker
+    'BATCH_SIZE': 500,       # notificações por bulk_create
+    'FLUSH_INTERVAL': 1.0,   # segundos que o worker espera para completar um lote
+    'MAX_QUEUE': 10000,      # com a fila cheia o evento é gravado na hora
+    'CACHE_ALIAS': 'default',
+    'UNREAD_TIMEOUT': 300,   # validade do total de não lidas em cache
+    'MARK_READ_BATCH': 1000, # linhas por UPDATE ao marcar como lidas
+    'AGGREGATE_WINDOW': 3600, # segundos em que avaliações/favoritos/seguidores se agrupam
+    'AGGREGATE_SAMPLE': 5,   # atores guardados em cada notificação agrupada
+}
+
+
+# Sugestões de quem seguir (api/suggestions.py; o cálculo, no comando build_suggestions, precisa do NumPy)
+SUGGESTIONS = {
+    'TOP_K': 20,             # sugestões guardadas por usuário
+    'BATCH_SIZE': 2000,      # linhas por INSERT ao gravar as sugestões
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -136,9 +191,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -161,7 +216,16 @@ SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
 }
 # Correção:
-AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']  
+AUTHENTICATION_BACKENDS = ['api.authentication.CachedModelBackend']
+
+# Usuários autenticados em cache no processo (api/authentication.py)
+AUTH_CACHE = {
+    'MAX_ENTRIES': 10000,  # tokens/usuários guardados (LRU)
+    'TIMEOUT': 60,         # segundos; limita o atraso de invalidação entre processos
+}
+
+# Sessão lida do cache, gravada também no banco
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
 AUTH_USER_MODEL = 'api.User'
 
@@ -179,3 +243,6 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
 }
+# Os refresh tokens emitidos e os da blacklist ficam nas tabelas do app
+# token_blacklist (buscados pelo `jti`, único). Rodar periodicamente (cron
+# diário) `python manage.py flushexpiredtokens` para apagar os já expirados.
@@ -3,9 +3,12 @@ from django.urls import path, include, re_path
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
-from api.views.views import RegisterView, login_view, test_endpoint, get_login, logout_view, edit_user, follow_user, unfollow_user
-from api.views.receitas import create_recipe, search_recipe, search_recipe_byId, favorite_recipe_byId, random_recipe, delete_recipe, patch_recipe, create_steps, get_ingredients_by_recipe_id, delete_step
+from api.views.views import RegisterView, login_view, test_endpoint, get_login, logout_view, edit_user, follow_user, unfollow_user, list_followers, list_following, suggested_users
+from api.views.receitas import create_recipe, search_recipe, search_recipe_byId, search_recipe_by_ingredients, create_recipes_bulk, export_recipes, favorite_recipe_byId, random_recipe, delete_recipe, patch_recipe, create_steps, reorder_steps, get_ingredients_by_recipe_id, delete_step, similar_recipes
 from api.views.ingredients import create_ingredient, delete_ingredient
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView, TokenBlacklistView
+from api.views.feed import get_feed
+from api.views.notifications import list_notifications, unread_notifications_count, mark_notifications_read
 from api.views.comments import get_list_comments_byId, create_comment_byId, delete_comment_byId, rating_recipe_byId, get_rating_recipe_byId
 
 schema_view = get_schema_view(
@@ -28,18 +31,35 @@ urlpatterns = [
     path('auth/signup/', RegisterView.as_view(), name='register'),
     path('auth/me/', get_login, name='get_me'),
     path('auth/logout/', logout_view, name='logout'),
+    # JWT: sem sessão nem Token no banco; o access token vale sozinho
+    path('auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),     # POST → access + refresh
+    path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),    # POST → novo par (o refresh antigo vai para a blacklist)
+    path('auth/token/verify/', TokenVerifyView.as_view(), name='token_verify'),       # POST → token ainda válido?
+    path('auth/token/blacklist/', TokenBlacklistView.as_view(), name='token_blacklist'),  # POST → logout do refresh token
 
     path('users/', edit_user, name='edit_user_logado'),
     path('users/<id>/follow', follow_user, name='seguir usuários'),
     path('users/<id>/unfollow', unfollow_user, name='deixar de seguir'),
+    path('users/suggestions/', suggested_users, name='sugestoes_de_usuarios'),  # GET → quem seguir
+    path('users/<int:id>/followers', list_followers, name='seguidores'),       # GET → quem segue o usuário
+    path('users/<int:id>/following', list_following, name='seguindo'),         # GET → quem o usuário segue
+    path('feed/', get_feed, name='feed'),                                   # GET → receitas de quem sigo
+    path('notifications/', list_notifications, name='notifications'),      # GET → notificações (?read=false)
+    path('notifications/unread-count/', unread_notifications_count, name='notifications-unread-count'),  # GET → badge
+    path('notifications/read/', mark_notifications_read, name='notifications-mark-read'),  # POST → marcar como lidas
 
     path('recipes/', search_recipe, name='buscar_receitas'),               # GET → lista/filtra
     path('recipes/<int:id>/', search_recipe_byId, name='buscar_receita_id'),  # GET → por id
     path('recipes/create/', create_recipe, name='criar_receita'),             # POST → criar
+    path('recipes/bulk/', create_recipes_bulk, name='criar_receitas_em_lote'),  # POST → criar várias
+    path('recipes/export/', export_recipes, name='exportar_receitas'),          # GET → NDJSON em streaming
     path('recipes/random/', random_recipe, name='receita_aleatoria'),        # GET → aleatória
+    path('recipes/<int:id>/similar', similar_recipes, name='receitas_parecidas'),  # GET → quem gostou desta também gostou de
+    path('recipes/with-ingredients/', search_recipe_by_ingredients, name='receitas_por_ingredientes'),  # GET → cozinhar com o que tenho
     path('recipes/<id>', delete_recipe, name='Usuário criador da receita pode deletar uma das suas receitas'),
     path('recipes/edite/<id>', patch_recipe, name='Usuário pode editar uma de suas receitas'),
     path('recipes/<id>/steps/', create_steps, name="create-steps"),
+    path('recipes/<id>/steps/reorder/', reorder_steps, name='reorder-steps'),
     path('recipes/<id_recipe>/steps/<id_step>', delete_step, name='delete-step'),
 
     path('ingredients/<id_recipe>', create_ingredient, name='create-ingredient'),      # POST → criar ingrediente